@@ -14,12 +14,22 @@ setup(
         'waybacker.api',
         'waybacker.components',
         'waybacker.db',
-        'waybacker.init'
+        'waybacker.init',
+        'waybacker.extraction'
     ],
     install_requires=[
         "requests~=2.31.0",
         "beautifulsoup4~=4.11.1",
         "tqdm~=4.64.1",
         "pandas~=2.2.0"
-    ]
+    ],
+    extras_require={
+        "parquet": ["pyarrow"],
+        "pdf": ["pypdf"]
+    },
+    entry_points={
+        "console_scripts": [
+            "waybacker=waybacker.cli:main"
+        ]
+    }
 )
\ No newline at end of file
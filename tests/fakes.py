@@ -0,0 +1,59 @@
+from typing import Dict, List, Optional, Tuple
+
+from waybacker.util.wayback_timestamp import parse_wayback_timestamp
+
+URL: str = 'http://example.org/a'
+
+
+def snapshot(timestamp: str, url: str = URL) -> Dict:
+    return {'status': '200', 'available': True, 'url': f'http://web.archive.org/web/{timestamp}/{url}',
+            'timestamp': timestamp}
+
+
+def success(timestamp: str, url: str = URL, content: str = '<html></html>') -> Dict:
+    return {'success': True, 'url': url, 'mime_type': 'html', 'content': content,
+            'wayback_data': snapshot(timestamp, url)}
+
+
+def failure(error_type: str, timestamp: Optional[str] = None, url: str = URL) -> Dict:
+    result: Dict = {'success': False, 'error': error_type, 'error_type': error_type}
+    if timestamp is not None:
+        result['wayback_data'] = snapshot(timestamp, url)
+    return result
+
+
+class FakeRequester:
+    """
+    Answers requests like WaybackRequester from a fixed set of snapshots (Wayback timestamp -> "html" or any other
+    mime-type), which are the same for every URL. Every request is recorded.
+    """
+
+    def __init__(self, snapshots: Optional[Dict[str, str]] = None):
+        self.snapshots: Dict[str, str] = snapshots or {}
+        # Tuples of the request type ("snapshot" or "content"), the URL and the timestamp.
+        self.requests: List[Tuple[str, str, Optional[str]]] = []
+
+    def get_snapshot(self, url: str, timestamp: Optional[str] = None) -> Optional[Dict]:
+        self.requests.append(('snapshot', url, timestamp))
+        if len(self.snapshots) == 0:
+            return None
+        if timestamp is None:
+            return snapshot(max(self.snapshots), url)
+        return snapshot(min(self.snapshots, key=lambda snapshot_timestamp: abs(
+            parse_wayback_timestamp(snapshot_timestamp) - parse_wayback_timestamp(timestamp)
+        )), url)
+
+    def get_from_snapshot(self, url: str, available_page_data: Optional[Dict]) -> Dict:
+        if available_page_data is None:
+            return failure('unavailable')
+        timestamp: str = available_page_data['timestamp']
+        self.requests.append(('content', url, timestamp))
+        if self.snapshots[timestamp] != 'html':
+            return failure('mime-type', timestamp, url)
+        return success(timestamp, url)
+
+    def get_from_wayback(self, url: str, timestamp: Optional[str] = None) -> Dict:
+        return self.get_from_snapshot(url, self.get_snapshot(url, timestamp))
+
+    def count(self, request_type: str) -> int:
+        return len([request for request in self.requests if request[0] == request_type])
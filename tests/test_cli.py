@@ -0,0 +1,93 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from fakes import FakeRequester
+from waybacker.cli import main, EXIT_OK, EXIT_FAILURE, EXIT_USAGE
+
+URLS: List[str] = ['http://a.org/x', 'http://b.org/y', 'https://www.a.org/x/', 'http://c.org/z']
+
+
+class FailingRequester(FakeRequester):
+    """
+    Fails with a connection error for URLs of "b.org".
+    """
+
+    def get_snapshot(self, url: str, timestamp: Optional[str] = None) -> Optional[Dict]:
+        if 'b.org' in url:
+            raise ConnectionError('Connection refused')
+        return super().get_snapshot(url, timestamp)
+
+
+@pytest.fixture
+def requester(monkeypatch) -> FakeRequester:
+    requester: FakeRequester = FakeRequester({'20200101000000': 'html'})
+    monkeypatch.setattr('waybacker.waybacker.WaybackRequester', lambda **kwargs: requester)
+    return requester
+
+
+def run(tmp_path, *args: str) -> Tuple[int, List[Dict]]:
+    input_path = tmp_path / 'urls.txt'
+    if not input_path.exists():
+        input_path.write_text('\n'.join(URLS) + '\n')
+    output_path = tmp_path / 'output.jsonl'
+    output_path.unlink(missing_ok=True)
+    exit_code: int = main(['--directory', str(tmp_path / 'db'), '-q', *args, '-o', str(output_path)])
+    if not output_path.exists():
+        return exit_code, []
+    return exit_code, [json.loads(line) for line in output_path.read_text().splitlines()]
+
+
+def test_fetch_rerun_makes_no_requests(tmp_path, requester):
+    exit_code, records = run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'))
+    assert exit_code == EXIT_OK
+    assert len(records) == len(URLS) and all(record['exists'] for record in records)
+    # Equivalent URLs are requested once.
+    assert requester.count('content') == 3
+
+    requester.requests.clear()
+    exit_code, records = run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'))
+    assert exit_code == EXIT_OK and len(records) == len(URLS)
+    assert requester.requests == []
+
+
+@pytest.mark.parametrize('timestamp', ['20200115', '2010'])
+def test_fetch_with_timestamp_rerun_makes_no_requests(tmp_path, requester, timestamp):
+    exit_code, records = run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'), '--timestamp', timestamp)
+    assert exit_code == EXIT_OK and len(records) == len(URLS)
+    # A snapshot outside the tolerance is not downloaded.
+    assert all(record['exists'] == (timestamp == '20200115') for record in records)
+
+    requester.requests.clear()
+    exit_code, records = run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'), '--timestamp', timestamp)
+    assert exit_code == EXIT_OK and len(records) == len(URLS)
+    assert requester.requests == []
+
+
+def test_fetch_continues_after_errors(tmp_path, monkeypatch):
+    requester: FakeRequester = FailingRequester({'20200101000000': 'html'})
+    monkeypatch.setattr('waybacker.waybacker.WaybackRequester', lambda **kwargs: requester)
+
+    exit_code, records = run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'))
+    assert exit_code == EXIT_FAILURE
+    assert sorted(record['url'] for record in records) == ['http://a.org/x', 'http://a.org/x', 'http://c.org/z']
+
+
+def test_fetch_with_invalid_timestamp_is_usage_error(tmp_path, requester):
+    exit_code, records = run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'), '--timestamp', '20AB')
+    assert exit_code == EXIT_USAGE and records == []
+    assert requester.requests == []
+
+
+def test_lookup_fails_for_missing_urls(tmp_path, requester):
+    run(tmp_path, 'fetch', str(tmp_path / 'urls.txt'))
+    requester.requests.clear()
+
+    exit_code, records = run(tmp_path, 'lookup', 'https://a.org/x')
+    assert exit_code == EXIT_OK and records[0]['exists']
+
+    exit_code, records = run(tmp_path, 'lookup', 'https://a.org/x', 'http://d.org/')
+    assert exit_code == EXIT_FAILURE
+    assert records[1] == {'url': 'http://d.org', 'exists': None}
+    assert requester.requests == []
@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+from os.path import dirname, abspath
+
+REPO_DIRECTORY: str = dirname(dirname(abspath(__file__)))
+
+# Heavy dependencies must only be imported by the features that need them.
+LAZY_MODULES = ['pandas', 'tqdm', 'bs4', 'requests', 'multiprocessing', 'concurrent.futures.process']
+
+
+def imported_modules() -> set:
+    output: str = subprocess.check_output(
+        [sys.executable, '-c', 'import sys, json, waybacker; print(json.dumps(sorted(sys.modules)))'],
+        cwd=REPO_DIRECTORY
+    ).decode('utf-8')
+    return set(json.loads(output))
+
+
+def test_import_does_not_load_heavy_dependencies():
+    modules: set = imported_modules()
+    loaded = [module for module in LAZY_MODULES if module in modules]
+    assert loaded == [], f'"import waybacker" loads: {loaded}'
+
+
+def test_page_extraction_is_exported():
+    from waybacker import PageExtraction
+    from waybacker.extraction.page_extraction import PageExtraction as ExtractionModulePageExtraction
+
+    assert PageExtraction is ExtractionModulePageExtraction
@@ -0,0 +1,68 @@
+import os
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+import pytest
+
+from fakes import success, failure
+from waybacker.components.wayback_entry import WaybackEntry
+from waybacker.db.sqlite_wayback_db import SqliteWaybackDB
+from waybacker.util.file_utils import map_file
+
+URLS: List[str] = [f'http://example.org/{i}' for i in range(5)]
+
+
+@pytest.fixture
+def wayback_db(tmp_path) -> SqliteWaybackDB:
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path))
+    for url in URLS:
+        wayback_db.add_webpage(url, success('20200101000000', url, f'<html>{url}</html>'))
+    wayback_db.add_webpage('http://example.org/failed', failure('unavailable', url='http://example.org/failed'))
+    return wayback_db
+
+
+def read_all(batches: Iterator[List[Tuple[WaybackEntry, memoryview]]]) -> Dict[str, str]:
+    return {entry.url: bytes(page).decode('utf-8') for batch in batches for entry, page in batch}
+
+
+def test_map_file(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_bytes(b'<html></html>')
+    page: memoryview = map_file(str(path))
+    assert page.readonly and bytes(page) == b'<html></html>'
+
+    empty_path = tmp_path / 'empty.html'
+    empty_path.write_bytes(b'')
+    assert bytes(map_file(str(empty_path))) == b''
+
+    with pytest.raises(FileNotFoundError):
+        map_file(str(tmp_path / 'missing.html'))
+
+
+def test_iter_pages_in_batches(wayback_db):
+    batches: List[List[Tuple[WaybackEntry, memoryview]]] = list(wayback_db.iter_pages(batch_size=2, num_workers=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert read_all(iter(batches)) == {url: f'<html>{url}</html>' for url in URLS}
+
+
+def test_iter_pages_filter(wayback_db):
+    pages: Dict[str, str] = read_all(wayback_db.iter_pages(entry_filter=lambda entry: entry.url.endswith('/3')))
+    assert list(pages) == ['http://example.org/3']
+
+
+def test_iter_pages_empty_and_missing_files(wayback_db):
+    open(wayback_db.get(URLS[0]).full_path, 'w').close()
+    os.remove(wayback_db.get(URLS[1]).full_path)
+
+    pages: Dict[str, str] = read_all(wayback_db.iter_pages(batch_size=2, prefetch_batches=1))
+    assert pages[URLS[0]] == ''
+    assert URLS[1] not in pages
+    assert len(pages) == len(URLS) - 1
+
+
+def test_iter_pages_closed_early(wayback_db):
+    num_threads: int = threading.active_count()
+    batches = wayback_db.iter_pages(batch_size=1, num_workers=2)
+    assert len(next(batches)) == 1
+    batches.close()
+    assert threading.active_count() == num_threads
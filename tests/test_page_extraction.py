@@ -0,0 +1,92 @@
+import os
+from collections import Counter
+from typing import Dict, List
+
+import pytest
+
+from fakes import success, failure
+from waybacker.components.wayback_entry import WaybackEntry
+from waybacker.db.sqlite_wayback_db import SqliteWaybackDB
+from waybacker.extraction.extractors import Extractor
+from waybacker.extraction.page_extraction import PageExtraction
+
+URLS: List[str] = [f'http://example.org/{i}' for i in range(3)]
+
+
+class LengthExtractor(Extractor):
+    """
+    Counts the bytes of a page and fails for pages containing "broken".
+    """
+
+    name: str = 'length'
+
+    def __init__(self, version: str = '1'):
+        self.version: str = version
+
+    def supports(self, wayback_entry: WaybackEntry) -> bool:
+        return wayback_entry.success
+
+    def extract(self, content: bytes, url: str) -> Dict:
+        if b'broken' in content:
+            raise ValueError('Malformed page')
+        return {'length': len(content)}
+
+
+@pytest.fixture
+def wayback_db(tmp_path) -> SqliteWaybackDB:
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path))
+    for url in URLS:
+        wayback_db.add_webpage(url, success('20200101000000', url, f'<html>{url}</html>'))
+    wayback_db.add_webpage('http://example.org/failed', failure('unavailable', url='http://example.org/failed'))
+    return wayback_db
+
+
+def run(wayback_db: SqliteWaybackDB, version: str = '1') -> Counter:
+    return PageExtraction(wayback_db, [LengthExtractor(version)], num_processes=2).run()
+
+
+def test_run_is_incremental(wayback_db):
+    assert run(wayback_db) == Counter(extracted=3)
+    assert wayback_db.get_artifacts(wayback_db.get(URLS[0]), 'length') == {'length': len(f'<html>{URLS[0]}</html>')}
+
+    assert run(wayback_db) == Counter()
+    wayback_db.add_webpage('http://example.org/new', success('20200101000000', 'http://example.org/new'))
+    assert run(wayback_db) == Counter(extracted=1)
+
+
+def test_run_extracts_again_after_version_bump(wayback_db):
+    run(wayback_db)
+    assert run(wayback_db, version='2') == Counter(extracted=3)
+    assert run(wayback_db, version='2') == Counter()
+
+
+def test_extraction_errors_are_stored(wayback_db):
+    broken_url: str = 'http://example.org/broken'
+    wayback_db.add_webpage(broken_url, success('20200101000000', broken_url, 'broken'))
+
+    assert run(wayback_db) == Counter(extracted=3, errors=1)
+    assert wayback_db.get_artifacts(wayback_db.get(broken_url), 'length') is None
+    assert run(wayback_db) == Counter()
+
+
+def test_unreadable_pages_are_extracted_later(wayback_db):
+    path: str = wayback_db.get(URLS[0]).full_path
+    os.rename(path, f'{path}.moved')
+
+    assert run(wayback_db) == Counter(extracted=2, skipped=1)
+    assert PageExtraction(wayback_db, [LengthExtractor()]).extract(wayback_db.get(URLS[0])) == {}
+
+    os.rename(f'{path}.moved', path)
+    assert run(wayback_db) == Counter(extracted=1)
+
+
+def test_attach_extracts_added_pages(wayback_db):
+    extraction: PageExtraction = PageExtraction(wayback_db, [LengthExtractor()])
+    extraction.attach()
+
+    entry: WaybackEntry = wayback_db.add_webpage(
+        'http://example.org/new', success('20200101000000', 'http://example.org/new', 'new')
+    )
+    assert extraction.get(entry, 'length') == {'length': 3}
+    wayback_db.add_webpage('http://example.org/missing', failure('unavailable', url='http://example.org/missing'))
+    assert run(wayback_db) == Counter(extracted=3)
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from fakes import URL, FakeRequester, success, failure
+from waybacker import Waybacker
+
+
+def make_due(waybacker: Waybacker) -> None:
+    waybacker.get_db().connection.execute('UPDATE wayback_entry SET next_check = ?', (str(datetime(2000, 1, 1)), ))
+
+
+def test_retry_due_terminates_if_another_snapshot_is_stored(tmp_path):
+    waybacker: Waybacker = Waybacker(str(tmp_path))
+    waybacker.wayback_requester = FakeRequester({'20200101000000': 'image/png'})
+    waybacker.get_db().add_webpage(URL, failure('unavailable'))
+    make_due(waybacker)
+
+    assert len(list(waybacker.retry_due())) == 1
+    assert waybacker.wayback_requester.count('snapshot') == 1
+    assert waybacker.get_db().retry_due(datetime.now()) == []
+
+
+def test_retry_due_skips_urls_with_snapshots(tmp_path):
+    waybacker: Waybacker = Waybacker(str(tmp_path))
+    waybacker.get_db().add_webpage(URL, failure('mime-type', '20200101000000'))
+    waybacker.get_db().add_webpage(URL, success('20210101000000'))
+    make_due(waybacker)
+
+    assert waybacker.get_db().retry_due(datetime.now()) == []
+    assert waybacker.get_db().count_retry_due(datetime.now()) == 0
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from fakes import URL, FakeRequester
+from waybacker import Waybacker
+
+
+def make_waybacker(tmp_path, snapshots) -> Waybacker:
+    waybacker: Waybacker = Waybacker(str(tmp_path), timestamp_tolerance=timedelta(days=30))
+    waybacker.wayback_requester = FakeRequester(snapshots)
+    return waybacker
+
+
+def test_get_with_timestamp_reuses_snapshots_within_tolerance(tmp_path):
+    waybacker: Waybacker = make_waybacker(tmp_path, {'20200101000000': 'html', '20220101000000': 'html'})
+
+    assert waybacker.get(URL, timestamp='20200110').wayback_data['timestamp'] == '20200101000000'
+    assert waybacker.get('https://www.example.org/a/', timestamp='20191215').wayback_data['timestamp'] == (
+        '20200101000000'
+    )
+    assert waybacker.wayback_requester.count('content') == 1
+
+    # Outside the tolerance of the stored snapshot, Wayback is asked for the closest snapshot.
+    assert waybacker.get(URL, timestamp='20211220').wayback_data['timestamp'] == '20220101000000'
+    assert waybacker.wayback_requester.count('content') == 2
+
+
+def test_lookup_with_timestamp_respects_tolerance(tmp_path):
+    waybacker: Waybacker = make_waybacker(tmp_path, {'20200101000000': 'html'})
+    waybacker.get(URL, timestamp='20200101')
+
+    assert waybacker.lookup(URL, '20200125').wayback_data['timestamp'] == '20200101000000'
+    assert waybacker.lookup(URL, '20200301') is None
+    assert waybacker.lookup(URL, '20200301', tolerance=timedelta(days=90)) is not None
+    assert len(waybacker.wayback_requester.requests) == 2
+
+
+def test_snapshot_out_of_tolerance_is_not_returned(tmp_path):
+    waybacker: Waybacker = make_waybacker(tmp_path, {'20230101000000': 'html'})
+
+    entry = waybacker.get(URL, timestamp='2015')
+    assert not entry.success and entry.error_type == 'out-of-tolerance'
+    assert entry.wayback_data['timestamp'] == '20150101000000'
+    assert waybacker.wayback_requester.requests == [('snapshot', URL, '20150101000000')]
+
+    # Repeated requests are answered offline, other requests are not affected.
+    assert waybacker.get(URL, timestamp='2015').error_type == 'out-of-tolerance'
+    assert waybacker.lookup(URL, '2015').error_type == 'out-of-tolerance'
+    assert len(waybacker.wayback_requester.requests) == 1
+    assert waybacker.lookup(URL) is None
+    assert waybacker.get(URL).wayback_data['timestamp'] == '20230101000000'
+
+
+def test_overwrite_entry_keeps_earlier_snapshots(tmp_path):
+    waybacker: Waybacker = make_waybacker(tmp_path, {'20200101000000': 'html'})
+    waybacker.get(URL)
+    waybacker.wayback_requester.snapshots['20220101000000'] = 'html'
+
+    assert waybacker.get(URL).wayback_data['timestamp'] == '20200101000000'
+    assert waybacker.get(URL, overwrite_entry=True).wayback_data['timestamp'] == '20220101000000'
+    assert [entry.wayback_data['timestamp'] for entry in waybacker.get_db().get_snapshots(URL)] == [
+        '20200101000000', '20220101000000'
+    ]
+    assert waybacker.get(URL, timestamp='20200101').wayback_data['timestamp'] == '20200101000000'
@@ -0,0 +1,107 @@
+import sqlite3
+from typing import List, Tuple
+
+import pytest
+
+from fakes import URL, success, failure
+from waybacker.db.sqlite_wayback_db import SqliteWaybackDB
+from waybacker.util.url_canonicalizer import UrlCanonicalizer
+
+
+def test_unavailable_does_not_replace_snapshots(tmp_path):
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path))
+    wayback_db.add_webpage(URL, success('20200101000000'))
+
+    assert wayback_db.add_webpage(URL, failure('unavailable')).success
+    assert wayback_db.connection.execute('SELECT COUNT(*) FROM wayback_entry WHERE success = 0').fetchone()[0] == 0
+
+
+def test_failures_of_snapshots_are_keyed_by_timestamp(tmp_path):
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path))
+    wayback_db.add_webpage(URL, failure('unavailable'))
+    wayback_db.add_webpage(URL, success('20200101000000'))
+    wayback_db.add_webpage(URL, failure('mime-type', '20220101000000'))
+    entry = wayback_db.add_webpage(URL, failure('mime-type', '20220101000000'))
+
+    assert entry.check_attempts == 2
+    assert wayback_db.get(URL).success
+    assert not wayback_db.get(URL, '20220101000000').success
+    assert wayback_db.connection.execute(
+        'SELECT success, wayback_timestamp FROM wayback_entry ORDER BY wayback_timestamp'
+    ).fetchall() == [(1, '20200101000000'), (0, '20220101000000')]
+
+
+def test_get_nearest_returns_closest_successful_snapshot(tmp_path):
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path))
+    wayback_db.add_webpage(URL, success('20180101000000'))
+    wayback_db.add_webpage(URL, success('20200101000000'))
+    wayback_db.add_webpage(URL, failure('mime-type', '20190601000000'))
+
+    assert wayback_db.get_nearest(URL, '20180601000000').wayback_data['timestamp'] == '20180101000000'
+    assert wayback_db.get_nearest(URL, '20191001000000').wayback_data['timestamp'] == '20200101000000'
+    assert wayback_db.get_nearest('https://www.example.org/a/', '20300101000000').wayback_data['timestamp'] == (
+        '20200101000000'
+    )
+    assert wayback_db.get_nearest('http://example.org/b', '20200101000000') is None
+
+
+def test_migrate_url_primary_key_database(tmp_path):
+    # The schema of databases created before multiple snapshots per URL were supported.
+    connection: sqlite3.Connection = sqlite3.connect(str(tmp_path / 'wayback.db'))
+    connection.execute(
+        """
+        CREATE TABLE wayback_entry(
+        url TEXT NOT NULL PRIMARY KEY, success INT NOT NULL, mime_type TEXT, wayback_status INT,
+        wayback_available INT, wayback_url TEXT, wayback_timestamp TEXT, download_file_name TEXT,
+        collected_at TEXT, error TEXT, error_type TEXT
+        );
+        """
+    )
+    connection.executemany('INSERT INTO wayback_entry VALUES (?,?,?,?,?,?,?,?,?,?,?)', [
+        (URL, 1, 'html', 200, 1, 'http://web.archive.org/a', '20200101000000', 'a.html', '2021-01-01 00:00:00',
+         None, None),
+        ('https://www.example.org/a/', 0, None, 0, 0, None, None, None, '2021-01-02 00:00:00', 'not in wayback',
+         'unavailable'),
+        ('http://example.org/b', 0, None, 0, 0, None, None, None, '2021-01-03 00:00:00', 'not in wayback',
+         'unavailable')
+    ])
+    connection.commit()
+    connection.close()
+
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path))
+    columns: List[Tuple] = wayback_db.connection.execute('PRAGMA table_info(wayback_entry);').fetchall()
+    assert not any(column[1] == 'url' and column[5] > 0 for column in columns)
+
+    # The failure of the equivalent URL is obsolete, the other failure is scheduled for a re-check.
+    assert wayback_db.get('https://example.org/a').wayback_data['timestamp'] == '20200101000000'
+    failed = wayback_db.get('http://example.org/b')
+    assert failed.check_attempts == 1 and failed.next_check is not None
+    assert wayback_db.connection.execute('SELECT COUNT(*) FROM wayback_entry').fetchone()[0] == 2
+
+    # Further snapshots of the same URL can be stored now.
+    wayback_db.add_webpage(URL, success('20220101000000'))
+    assert [entry.wayback_data['timestamp'] for entry in wayback_db.get_snapshots(URL)] == [
+        '20200101000000', '20220101000000'
+    ]
+
+
+def test_different_canonicalizer_requires_rekey(tmp_path):
+    strict: UrlCanonicalizer = UrlCanonicalizer(ignore_scheme=False)
+    wayback_db: SqliteWaybackDB = SqliteWaybackDB(str(tmp_path), strict)
+    wayback_db.add_webpage('http://example.org/a', success('20200101000000', 'http://example.org/a'))
+    wayback_db.add_webpage('https://example.org/a', success('20200101000000', 'https://example.org/a'))
+    wayback_db.close()
+
+    with pytest.raises(ValueError):
+        SqliteWaybackDB(str(tmp_path))
+    wayback_db = SqliteWaybackDB(str(tmp_path), strict)
+    assert wayback_db.connection.execute('SELECT COUNT(*) FROM wayback_entry').fetchone()[0] == 2
+    wayback_db.close()
+
+    # Copies can always be re-keyed, the original remains unchanged.
+    copy: SqliteWaybackDB = SqliteWaybackDB.open_copy(str(tmp_path))
+    assert copy.connection.execute('SELECT COUNT(*) FROM wayback_entry').fetchone()[0] == 1
+    copy.close()
+
+    wayback_db = SqliteWaybackDB(str(tmp_path), rekey=True)
+    assert wayback_db.connection.execute('SELECT COUNT(*) FROM wayback_entry').fetchone()[0] == 1
@@ -0,0 +1,13 @@
+from waybacker.util.url_canonicalizer import UrlCanonicalizer
+
+
+def test_equivalent_urls_share_key():
+    canonicalizer: UrlCanonicalizer = UrlCanonicalizer()
+    assert canonicalizer.canonical_key('https://www.Example.org/a/?b=2&a=1&utm_source=x') == 'org,example)/a?a=1&b=2'
+    assert canonicalizer.canonical_key('http://example.org/%7Ea') == canonicalizer.canonical_key('example.org/~a')
+
+
+def test_unparseable_urls_are_their_own_key():
+    canonicalizer: UrlCanonicalizer = UrlCanonicalizer()
+    assert canonicalizer.canonical_key(' http://[bad/x ') == 'http://[bad/x'
+    assert canonicalizer.canonical_key('example.org:99999/a') != canonicalizer.canonical_key('example.org/a')
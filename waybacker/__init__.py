@@ -4,3 +4,13 @@ __author__ = 'Max Glockner'
 from .live_url_crawler import LiveURLCollector
 from .waybacker import Waybacker
 from .components.wayback_entry import WaybackEntry
+from .util.url_canonicalizer import UrlCanonicalizer
+from .util.recheck_policy import RecheckPolicy
+
+
+def __getattr__(name: str):
+    # PageExtraction loads multiprocessing, so it is only imported when it is used.
+    if name == 'PageExtraction':
+        from .extraction.page_extraction import PageExtraction
+        return PageExtraction
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,5 @@
+import sys
+
+from waybacker.cli import main
+
+sys.exit(main())
@@ -1,12 +1,20 @@
-from typing import Optional, Dict
-
-import requests
+import logging
+from typing import Optional, Dict, TYPE_CHECKING
 
 from waybacker.util.requester import get_with_retry, retry_with_delay
 
+if TYPE_CHECKING:
+    import requests
+
+
+def request_get_snapshot(url: str, timestamp: Optional[str] = None) -> Optional[Dict]:
+    import requests
 
-def request_get_snapshot(url) -> Optional[Dict]:
-    data = requests.get(f'http://archive.org/wayback/available?url={url}').json()
+    params: Dict = {'url': url}
+    if timestamp is not None:
+        # Wayback returns the snapshot closest to this timestamp (instead of the most recent one).
+        params['timestamp'] = timestamp
+    data = requests.get('http://archive.org/wayback/available', params=params).json()
     if 'closest' in data['archived_snapshots']:
         snapshot = data['archived_snapshots']['closest']
         assert snapshot['available'] is True, f'Snapshot not available: {url}'
@@ -27,12 +35,17 @@ class WaybackRequester:
         self.delay_after_error: int = delay_after_error
         self.retry_attempts: int = retry_attempts
 
-    def get_from_wayback(self, url: str) -> Optional[Dict]:
-
+    def get_snapshot(self, url: str, timestamp: Optional[str] = None) -> Optional[Dict]:
         available_page_data: Optional[Dict] = retry_with_delay(
-            lambda: request_get_snapshot(url), self.retry_attempts, self.delay_after_error
+            lambda: request_get_snapshot(url, timestamp), self.retry_attempts, self.delay_after_error
         )
-        print('available_page_data', available_page_data)
+        logging.debug(f'available_page_data: {available_page_data}')
+        return available_page_data
+
+    def get_from_wayback(self, url: str, timestamp: Optional[str] = None) -> Optional[Dict]:
+        return self.get_from_snapshot(url, self.get_snapshot(url, timestamp))
+
+    def get_from_snapshot(self, url: str, available_page_data: Optional[Dict]) -> Dict:
         if not available_page_data:
             return {
                 'success': False,
@@ -41,7 +54,7 @@ class WaybackRequester:
             }
 
         assert 'url' in available_page_data and available_page_data['url'] is not None
-        res: requests.Response = get_with_retry(available_page_data['url'], self.retry_attempts, self.delay_after_error)
+        res: 'requests.Response' = get_with_retry(available_page_data['url'], self.retry_attempts, self.delay_after_error)
         mime_type: str = res.headers['content-type']
 
         if 'application/pdf' in mime_type:
@@ -54,7 +67,9 @@ class WaybackRequester:
             return {
                 'success': False,
                 'error': f'Unknown mime-type: "{mime_type}"',
-                'error_type': 'mime-type'
+                'error_type': 'mime-type',
+                # The error refers to this snapshot, other snapshots of the URL may be supported.
+                'wayback_data': available_page_data
             }
 
         return {
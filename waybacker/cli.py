@@ -0,0 +1,484 @@
+import argparse
+import csv
+import json
+import logging
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from waybacker.components.wayback_entry import WaybackEntry
+from waybacker.db.wayback_db import WaybackDB
+from waybacker.init.initialization import get_default_initialization, get_wayback_db_copy
+from waybacker.util.wayback_timestamp import to_wayback_timestamp
+from waybacker.waybacker import Waybacker, normalize_url
+
+EXIT_OK: int = 0
+EXIT_FAILURE: int = 1
+EXIT_USAGE: int = 2
+EXIT_INTERRUPTED: int = 130
+
+PARQUET_BATCH_SIZE: int = 10_000
+
+
+class Progress:
+    """
+    Line based progress report on stderr. Unlike a progress bar, it stays readable in batch scheduler logs.
+    """
+
+    def __init__(self, every: int, quiet: bool = False):
+        self.every: int = every
+        self.quiet: bool = quiet
+        self.counts: Counter = Counter()
+
+    def update(self, key: str) -> None:
+        self.counts[key] += 1
+        self.counts['processed'] += 1
+        if self.every > 0 and self.counts['processed'] % self.every == 0:
+            self.report()
+
+    def report(self) -> None:
+        if not self.quiet:
+            summary: str = ', '.join(f'{key}={value}' for key, value in sorted(self.counts.items()))
+            print(f'[waybacker] {summary}', file=sys.stderr, flush=True)
+
+
+def read_urls(src: str) -> Iterator[str]:
+    """
+    Lazily read one URL per line from a file, or from stdin if src is "-". Empty lines are skipped.
+
+    Parameters
+    -----------
+        src: str
+            Path to the input file or "-".
+
+    Return
+    -------
+        urls: Iterator
+            The stripped URLs.
+    """
+    f_in: TextIO = sys.stdin if src == '-' else open(src, encoding='utf-8')
+    try:
+        for line in f_in:
+            url: str = line.strip()
+            if len(url) > 0:
+                yield url
+    finally:
+        if f_in is not sys.stdin:
+            f_in.close()
+
+
+def open_output(dest: str) -> TextIO:
+    if dest == '-':
+        return sys.stdout
+    return open(dest, 'w', encoding='utf-8', newline='')
+
+
+def entry_to_json(entry: WaybackEntry) -> str:
+    record: Dict = entry.to_record()
+    record['error_type'] = entry.error_type
+    return json.dumps(record)
+
+
+def get_tolerance(args: argparse.Namespace) -> Optional[timedelta]:
+    return timedelta(days=args.tolerance_days) if args.tolerance_days is not None else None
+
+
+def add_timestamp_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--timestamp', default=None, help='Use snapshots closest to this time (e.g. "20200315").')
+    parser.add_argument(
+        '--tolerance-days', type=float, default=None,
+        help='Maximum distance in days between --timestamp and a stored snapshot (default: 30).'
+    )
+
+
+def make_waybacker(args: argparse.Namespace) -> Waybacker:
+    return Waybacker(directory=args.directory, db_backend=args.db_backend, sleep_time_seconds=args.sleep)
+
+
+def cmd_fetch(args: argparse.Namespace) -> int:
+    """
+    Collect every URL of the input from Wayback. URLs already in the database are not requested again, which makes
+    an interrupted run resumable by simply starting it again with the same input.
+    """
+    waybacker: Waybacker = make_waybacker(args)
+    progress: Progress = Progress(args.progress_every, args.quiet)
+    max_pending: int = args.workers * 2
+    tolerance: Optional[timedelta] = get_tolerance(args)
+    timestamp: Optional[str] = to_wayback_timestamp(args.timestamp) if args.timestamp is not None else None
+    # The URL of each request in flight, and whether the request only resolves the closest snapshot.
+    pending: Dict[Future, Tuple[str, bool]] = {}
+    # Canonical keys of the URLs in flight (with the number of equivalent input URLs waiting for the same request), so
+    # that equivalent URLs are requested only once.
+    in_flight: Dict[str, int] = {}
+    f_out: TextIO = open_output(args.output)
+
+    def must_retry(entry: WaybackEntry) -> bool:
+        return entry.has_error() and (args.retry_unsuccessful or (args.retry_due and entry.is_retry_due()))
+
+    def collect(executor: ThreadPoolExecutor, done: Iterable[Future]) -> None:
+        # Database reads and writes happen on the main thread only; workers only talk to Wayback.
+        for future in done:
+            url, is_snapshot = pending.pop(future)
+            try:
+                if is_snapshot:
+                    snapshot: Optional[Dict] = future.result()
+                    out_of_tolerance: Optional[Dict] = waybacker.out_of_tolerance(snapshot, timestamp, tolerance)
+                    entry: Optional[WaybackEntry] = None
+                    if out_of_tolerance is not None:
+                        # Stored for the requested timestamp, so that a rerun does not ask Wayback again.
+                        entry = waybacker.get_db().add_webpage(url, out_of_tolerance)
+                        progress.update('failed')
+                    else:
+                        # The closest snapshot in Wayback may be stored already.
+                        if snapshot is not None:
+                            entry = waybacker.get_db().get(url, snapshot['timestamp'])
+                        if entry is None or must_retry(entry):
+                            pending[executor.submit(
+                                waybacker.wayback_requester.get_from_snapshot, url, snapshot
+                            )] = (url, False)
+                            continue
+                        progress.update('cached')
+                else:
+                    entry = waybacker.get_db().add_webpage(url, future.result())
+                    progress.update('fetched' if entry.success else 'failed')
+            except Exception as err:
+                logging.error(f'Failed to collect "{url}": {err}')
+                progress.update('errors')
+                in_flight.pop(waybacker.get_db().canonical_key(url))
+                continue
+            # One output line per input URL, including the equivalent URLs that waited for this request.
+            for _ in range(1 + in_flight.pop(waybacker.get_db().canonical_key(url))):
+                f_out.write(entry_to_json(entry) + '\n')
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            try:
+                for url in read_urls(args.input):
+                    url = normalize_url(url)
+                    key: str = waybacker.get_db().canonical_key(url)
+                    if key in in_flight:
+                        in_flight[key] += 1
+                        progress.update('duplicates')
+                        continue
+
+                    # A single malformed URL must not abort the whole batch.
+                    try:
+                        entry: Optional[WaybackEntry] = waybacker.lookup(url, args.timestamp, tolerance)
+                    except Exception as err:
+                        logging.error(f'Failed to look up "{url}": {err}')
+                        progress.update('errors')
+                        continue
+
+                    if entry is not None and not must_retry(entry):
+                        f_out.write(entry_to_json(entry) + '\n')
+                        progress.update('cached')
+                        continue
+
+                    in_flight[key] = 0
+                    if timestamp is None:
+                        pending[executor.submit(waybacker.wayback_requester.get_from_wayback, url)] = (url, False)
+                    else:
+                        pending[executor.submit(waybacker.wayback_requester.get_snapshot, url, timestamp)] = (
+                            url, True
+                        )
+                    if len(pending) >= max_pending:
+                        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                        collect(executor, done)
+
+                # Resolved snapshots may be followed by a download, so wait until no request is in flight.
+                while len(pending) > 0:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(executor, done)
+            except KeyboardInterrupt:
+                for future in pending:
+                    future.cancel()
+                raise
+    except KeyboardInterrupt:
+        progress.report()
+        return EXIT_INTERRUPTED
+    finally:
+        f_out.flush()
+        if f_out is not sys.stdout:
+            f_out.close()
+
+    progress.report()
+    return EXIT_FAILURE if progress.counts['errors'] > 0 else EXIT_OK
+
+
+def cmd_retry(args: argparse.Namespace) -> int:
+    """
+    Retry all failed entries that are due for a re-check, and print the updated entries.
+    """
+    waybacker: Waybacker = make_waybacker(args)
+    progress: Progress = Progress(args.progress_every, args.quiet)
+    f_out: TextIO = open_output(args.output)
+    try:
+        for entry in waybacker.retry_due(limit=args.limit):
+            f_out.write(entry_to_json(entry) + '\n')
+            progress.update('fetched' if entry.success else 'failed')
+    finally:
+        f_out.flush()
+        if f_out is not sys.stdout:
+            f_out.close()
+
+    progress.report()
+    return EXIT_OK
+
+
+def cmd_lookup(args: argparse.Namespace) -> int:
+    """
+    Print the stored entries of the input URLs without contacting Wayback. Fails if any URL is not stored.
+    """
+    waybacker: Waybacker = make_waybacker(args)
+    urls: Iterable[str] = args.urls if len(args.urls) > 0 else read_urls(args.input)
+    missing: int = 0
+    f_out: TextIO = open_output(args.output)
+    try:
+        for url in urls:
+            entry: Optional[WaybackEntry] = waybacker.lookup(url, args.timestamp, get_tolerance(args))
+            if entry is None:
+                missing += 1
+                f_out.write(json.dumps({'url': normalize_url(url), 'exists': None}) + '\n')
+            else:
+                f_out.write(entry_to_json(entry) + '\n')
+    finally:
+        f_out.flush()
+        if f_out is not sys.stdout:
+            f_out.close()
+    return EXIT_FAILURE if missing > 0 else EXIT_OK
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """
+    Export records as CSV or Parquet. Without an input, all stored entries are exported. With an input, each URL is
+    collected via Waybacker.get() (as in Waybacker.export_csv()).
+    """
+    waybacker: Waybacker = make_waybacker(args)
+    if args.input is None:
+        entries: Iterable[WaybackEntry] = waybacker.get_db().entries()
+    else:
+        entries: Iterable[WaybackEntry] = map(waybacker.get, read_urls(args.input))
+
+    progress: Progress = Progress(args.progress_every, args.quiet)
+    records: Iterator[Dict] = map(lambda entry: entry.to_record(), entries)
+
+    if args.format == 'csv':
+        f_out: TextIO = open_output(args.dest)
+        try:
+            writer: Optional[csv.DictWriter] = None
+            for record in records:
+                if writer is None:
+                    writer = csv.DictWriter(f_out, fieldnames=list(record.keys()))
+                    writer.writeheader()
+                writer.writerow(record)
+                progress.update('exported')
+        finally:
+            f_out.flush()
+            if f_out is not sys.stdout:
+                f_out.close()
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            logging.error('Parquet export requires "pyarrow" (pip install waybacker[parquet]).')
+            return EXIT_FAILURE
+
+        if args.dest == '-':
+            logging.error('Parquet export requires a file as destination.')
+            return EXIT_USAGE
+
+        schema = pa.schema([
+            ('url', pa.string()), ('wayback_url', pa.string()), ('wayback_timestamp', pa.string()),
+            ('exists', pa.bool_()), ('mime', pa.string())
+        ])
+        with pq.ParquetWriter(args.dest, schema) as writer:
+            batch: List[Dict] = []
+            for record in records:
+                batch.append(record)
+                progress.update('exported')
+                if len(batch) >= PARQUET_BATCH_SIZE:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if len(batch) > 0:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+    progress.report()
+    return EXIT_OK
+
+
+def cmd_merge(args: argparse.Namespace) -> int:
+    """
+    Copy all entries (and downloaded pages) of another waybacker directory that are not yet stored.
+    """
+    waybacker: Waybacker = make_waybacker(args)
+    other_backend: str = args.other_db_backend or get_default_initialization()['db_backend']
+    # Opening the other database migrates it, which must not happen to the input of a merge.
+    other: WaybackDB = get_wayback_db_copy(db_backend=other_backend, directory=args.other_directory)
+    try:
+        waybacker.absorb_wayback_db(other)
+    finally:
+        other.close()
+    return EXIT_OK
+
+
+def cmd_discover(args: argparse.Namespace) -> int:
+    """
+    Print the URLs found by a LiveURLCollector, one per line, so that they can be piped into "fetch".
+    """
+    from waybacker.live_url_crawler import LiveURLCollector
+
+    collector: LiveURLCollector = LiveURLCollector(
+        link_query=args.link_query,
+        overview_iterator=args.overview_iterator,
+        start_page_index=args.start_page_index,
+        sleep_time=args.sleep_time
+    )
+    f_out: TextIO = open_output(args.output)
+    try:
+        for entry in collector.collect_urls(max_links=args.max_links):
+            f_out.write((str(entry) if args.json else entry.url) + '\n')
+            f_out.flush()
+    finally:
+        if f_out is not sys.stdout:
+            f_out.close()
+    return EXIT_OK
+
+
+def cmd_extract(args: argparse.Namespace) -> int:
+    """
+    Extract the artifacts (title, clean text, outgoing links, PDF text) of all pages that were not extracted yet.
+    """
+    from waybacker.extraction.page_extraction import PageExtraction
+
+    waybacker: Waybacker = make_waybacker(args)
+    progress: Progress = Progress(args.progress_every, args.quiet)
+    extraction: PageExtraction = PageExtraction(waybacker.get_db(), num_processes=args.processes)
+    try:
+        counts: Counter = extraction.run(
+            on_result=lambda entry, extractor, success: progress.update('extracted' if success else 'errors')
+        )
+    except ImportError as err:
+        logging.error(f'Missing dependency for extraction: {err}')
+        return EXIT_FAILURE
+    progress.report()
+    return EXIT_FAILURE if counts['errors'] > 0 and counts['extracted'] == 0 else EXIT_OK
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    """
+    Print summary counts of the stored entries as JSON.
+    """
+    waybacker: Waybacker = make_waybacker(args)
+    counts: Counter = Counter()
+    mime_types: Counter = Counter()
+    error_types: Counter = Counter()
+    for entry in waybacker.get_db().entries():
+        counts['total'] += 1
+        if entry.success:
+            counts['success'] += 1
+            mime_types[entry.mime_type] += 1
+        else:
+            counts['failed'] += 1
+            error_types[entry.error_type] += 1
+
+    print(json.dumps({
+        'directory': waybacker.directory,
+        'total': counts['total'],
+        'success': counts['success'],
+        'failed': counts['failed'],
+        # Counted like "retry" selects them, i.e. without failures of URLs that have a successful snapshot.
+        'retry_due': waybacker.get_db().count_retry_due(),
+        'mime_types': dict(mime_types),
+        'error_types': dict(error_types)
+    }, indent=2))
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog='waybacker', description='Collect webpages reproducibly via the Wayback Machine.'
+    )
+    parser.add_argument(
+        '--directory', default=None, help='Waybacker directory (default: $WAYBACKER_DIR or ~/waybacker).'
+    )
+    parser.add_argument('--db-backend', default=None, help='Database backend (default: $WAYBACKER_DB or "sqlite").')
+    parser.add_argument('--sleep', type=int, default=None, help='Seconds to wait before querying Wayback.')
+    parser.add_argument('--log-level', default='WARNING', help='Python logging level (default: WARNING).')
+    parser.add_argument('--progress-every', type=int, default=1000, help='Report progress every N items (0 disables).')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not report progress.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch = subparsers.add_parser('fetch', help='Collect URLs (one per line) from Wayback. Resumable.')
+    fetch.add_argument('input', nargs='?', default='-', help='File with one URL per line (default: stdin).')
+    fetch.add_argument('-o', '--output', default='-', help='JSON lines output (default: stdout).')
+    fetch.add_argument('-w', '--workers', type=int, default=4, help='Number of concurrent requests (default: 4).')
+    fetch.add_argument('--retry-unsuccessful', action='store_true', help='Retry URLs that failed previously.')
+    fetch.add_argument(
+        '--retry-due', action='store_true', help='Retry URLs that failed previously, if due for a re-check.'
+    )
+    add_timestamp_arguments(fetch)
+    fetch.set_defaults(fn=cmd_fetch)
+
+    retry = subparsers.add_parser('retry', help='Retry failed URLs that are due for a re-check.')
+    retry.add_argument('--limit', type=int, default=None, help='Maximum number of URLs to retry.')
+    retry.add_argument('-o', '--output', default='-', help='JSON lines output (default: stdout).')
+    retry.set_defaults(fn=cmd_retry)
+
+    lookup = subparsers.add_parser('lookup', help='Print stored entries without contacting Wayback.')
+    lookup.add_argument('urls', nargs='*', help='URLs to look up (default: read from --input).')
+    lookup.add_argument('-i', '--input', default='-', help='File with one URL per line (default: stdin).')
+    lookup.add_argument('-o', '--output', default='-', help='JSON lines output (default: stdout).')
+    add_timestamp_arguments(lookup)
+    lookup.set_defaults(fn=cmd_lookup)
+
+    export = subparsers.add_parser('export', help='Export records as CSV or Parquet.')
+    export.add_argument('dest', help='Destination file ("-" for stdout, CSV only).')
+    export.add_argument('-i', '--input', default=None, help='Export (and collect) only these URLs ("-" for stdin).')
+    export.add_argument('-f', '--format', choices=['csv', 'parquet'], default='csv')
+    export.set_defaults(fn=cmd_export)
+
+    merge = subparsers.add_parser('merge', help='Absorb the entries of another waybacker directory.')
+    merge.add_argument('other_directory', help='Directory of the waybacker database to absorb.')
+    merge.add_argument('--other-db-backend', default=None, help='Database backend of the other directory.')
+    merge.set_defaults(fn=cmd_merge)
+
+    discover = subparsers.add_parser('discover', help='Collect URLs from a live webpage via pagination.')
+    discover.add_argument('link_query', help='CSS selector of the <a></a> links to collect.')
+    discover.add_argument('overview_iterator', help='Pagination URL containing "@@PAGE@@".')
+    discover.add_argument('--start-page-index', type=int, default=1)
+    discover.add_argument('--sleep-time', type=int, default=1)
+    discover.add_argument('--max-links', type=int, default=None)
+    discover.add_argument('--json', action='store_true', help='Print JSON lines including the page number.')
+    discover.add_argument('-o', '--output', default='-', help='Output file (default: stdout).')
+    discover.set_defaults(fn=cmd_discover)
+
+    extract = subparsers.add_parser('extract', help='Extract title, text and links of all pages not extracted yet.')
+    extract.add_argument('-p', '--processes', type=int, default=None, help='Number of processes (default: #CPUs).')
+    extract.set_defaults(fn=cmd_extract)
+
+    stats = subparsers.add_parser('stats', help='Print summary counts of the stored entries.')
+    stats.set_defaults(fn=cmd_stats)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args: argparse.Namespace = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr)
+    try:
+        return args.fn(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except BrokenPipeError:
+        # Downstream consumer (e.g. "head") closed the pipe.
+        return EXIT_OK
+    except ValueError as err:
+        logging.error(f'{err}')
+        return EXIT_USAGE
+
+
+if __name__ == '__main__':
+    sys.exit(main())
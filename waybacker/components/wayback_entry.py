@@ -1,5 +1,6 @@
 import json
 import os.path
+from datetime import datetime
 from os.path import join
 from typing import Dict, Optional
 
@@ -16,7 +17,10 @@ class WaybackEntry:
             file_name: str,
             wayback_data: Dict,
             collected_at: str,
-            download_directory: str
+            download_directory: str,
+            check_attempts: Optional[int] = None,
+            last_checked: Optional[str] = None,
+            next_check: Optional[str] = None
     ):
         self.success: bool = success
         self.error: str = error
@@ -27,6 +31,11 @@ class WaybackEntry:
         self.collected_at: str = collected_at
         self.wayback_data: Dict = wayback_data
 
+        # Only set for failed entries: when (and how often) Wayback was queried, and when to query it again.
+        self.check_attempts: Optional[int] = check_attempts
+        self.last_checked: Optional[str] = last_checked
+        self.next_check: Optional[str] = next_check
+
         self.full_path: Optional[str] = None
         if self.success:
             self.full_path = os.path.abspath(join(download_directory, self.file_name))
@@ -50,12 +59,18 @@ class WaybackEntry:
             'file_name': self.file_name,
             'collected_at': self.collected_at,
             'wayback_data': self.wayback_data,
-            'full_path': self.full_path
+            'full_path': self.full_path,
+            'check_attempts': self.check_attempts,
+            'last_checked': self.last_checked,
+            'next_check': self.next_check
         }
 
     def has_error(self) -> bool:
         return not self.success
 
+    def is_retry_due(self, now: Optional[datetime] = None) -> bool:
+        return self.has_error() and self.next_check is not None and self.next_check <= str(now or datetime.now())
+
     def __str__(self) -> str:
         return json.dumps(self.to_dict(), indent=2)
 
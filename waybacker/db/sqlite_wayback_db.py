@@ -1,13 +1,28 @@
+import json
+import logging
 import os
 import shutil
 import sqlite3
+import tempfile
 from datetime import datetime
+from pathlib import Path
 from os.path import join, exists
 from sqlite3 import Connection, Cursor
 from typing import Dict, Optional, List, Tuple, Iterable
 
 from waybacker.db.wayback_db import WaybackDB
 from waybacker.components.wayback_entry import WaybackEntry
+from waybacker.util.recheck_policy import RecheckPolicy
+from waybacker.util.url_canonicalizer import UrlCanonicalizer
+from waybacker.util.wayback_timestamp import parse_wayback_timestamp
+
+# Failed entries due for a re-check. Failures of URLs with a successful snapshot are never due.
+RETRY_DUE_CONDITION: str = """
+    success = 0 AND next_check <= ? AND NOT EXISTS (
+        SELECT 1 FROM wayback_entry AS snapshot
+        WHERE snapshot.canonical_key = wayback_entry.canonical_key AND snapshot.success = 1
+    )
+"""
 
 
 def result_to_sql_dict(result: Dict, download_file_name: Optional[str], url: str) -> Dict:
@@ -18,8 +33,11 @@ def result_to_sql_dict(result: Dict, download_file_name: Optional[str], url: str
         'download_file_name': download_file_name,
         'collected_at': str(datetime.now()),
         'error': result['error'] if 'error' in result else None,
-        'error_type': result['error_type'] if 'error' in result else None
+        'error_type': result['error_type'] if 'error' in result else None,
+        'check_attempts': result['check_attempts'] if 'check_attempts' in result else None,
+        'next_check': None
     }
+    return_dict['last_checked'] = result.get('last_checked') or return_dict['collected_at']
 
     if 'wayback_data' in result and result['wayback_data'] is not None:
         return_dict['wayback_status'] = int(result['wayback_data']['status'])
@@ -43,9 +61,11 @@ class SqliteWaybackDB(WaybackDB):
             """
             SELECT 
             url, success, mime_type, wayback_status, wayback_available, wayback_url, wayback_timestamp,
-            download_file_name, collected_at, error, error_type FROM wayback_entry
+            download_file_name, collected_at, error, error_type, check_attempts, last_checked, next_check
+            FROM wayback_entry
             """
-        ).fetchall()
+        )
+        # Stream rows from the cursor so that large databases are not loaded into memory at once.
         for entry in result:
             yield self.sql_to_wayback_entry(entry)
 
@@ -59,26 +79,230 @@ class SqliteWaybackDB(WaybackDB):
 
         self.add_webpage_entry(entry_other.url, entry_other.to_dict(), entry_other.file_name)
 
-    def __init__(self, directory: str):
+    def __init__(
+            self,
+            directory: str,
+            canonicalizer: Optional[UrlCanonicalizer] = None,
+            recheck_policy: Optional[RecheckPolicy] = None,
+            rekey: bool = False
+    ):
         self.db_file_path: str = join(directory, 'wayback.db')
         if not exists(directory):
             os.makedirs(directory)
         self.connection: Connection = sqlite3.connect(self.db_file_path)
 
-        super().__init__(directory)
+        super().__init__(directory, canonicalizer, recheck_policy, rekey)
         if not exists(self.download_directory):
             os.makedirs(self.download_directory)
 
-    def get(self, url: str) -> Optional[WaybackEntry]:
+        # Only set for copies, see open_copy().
+        self.temporary_directory: Optional[str] = None
+
+    @classmethod
+    def open_copy(
+            cls,
+            directory: str,
+            canonicalizer: Optional[UrlCanonicalizer] = None,
+            recheck_policy: Optional[RecheckPolicy] = None
+    ) -> 'SqliteWaybackDB':
+        """
+        Open a temporary copy of the database in the directory, e.g. to read from it without migrating it in place.
+        The copy is re-keyed if needed. Downloaded pages are still read from the original directory. Call close() to
+        remove the copy.
+        """
+        db_file_path: str = join(directory, 'wayback.db')
+        if not exists(db_file_path):
+            raise ValueError(f'No waybacker database found in "{directory}"!')
+
+        temporary_directory: str = tempfile.mkdtemp(prefix='waybacker-')
+        source: Connection = sqlite3.connect(f'{Path(db_file_path).absolute().as_uri()}?mode=ro', uri=True)
+        destination: Connection = sqlite3.connect(join(temporary_directory, 'wayback.db'))
+        source.backup(destination)
+        source.close()
+        destination.close()
+
+        wayback_db: SqliteWaybackDB = cls(temporary_directory, canonicalizer, recheck_policy, rekey=True)
+        wayback_db.temporary_directory = temporary_directory
+        wayback_db.download_directory = join(directory, 'pages')
+        return wayback_db
+
+    def close(self) -> None:
+        self.connection.close()
+        if self.temporary_directory is not None:
+            shutil.rmtree(self.temporary_directory, ignore_errors=True)
+
+    def get(self, url: str, timestamp: Optional[str] = None) -> Optional[WaybackEntry]:
+        if timestamp is None:
+            # Prefer successful entries, then the most recently collected snapshot. Failures for a requested time
+            # (no snapshot within the tolerance) say nothing about the URL in general.
+            return self._select_one(
+                "WHERE canonical_key = ? AND error_type IS NOT 'out-of-tolerance' "
+                'ORDER BY success DESC, collected_at DESC LIMIT 1',
+                (self.canonical_key(url), )
+            )
+        return self._select_one(
+            'WHERE canonical_key = ? AND wayback_timestamp = ?', (self.canonical_key(url), timestamp)
+        )
+
+    def get_nearest(self, url: str, timestamp: str) -> Optional[WaybackEntry]:
+        # Both queries are answered by the (canonical_key, wayback_timestamp) index.
+        key: str = self.canonical_key(url)
+        candidates: List[WaybackEntry] = [entry for entry in [
+            self._select_one(
+                'WHERE canonical_key = ? AND success = 1 AND wayback_timestamp <= ? '
+                'ORDER BY wayback_timestamp DESC LIMIT 1', (key, timestamp)
+            ),
+            self._select_one(
+                'WHERE canonical_key = ? AND success = 1 AND wayback_timestamp > ? '
+                'ORDER BY wayback_timestamp ASC LIMIT 1', (key, timestamp)
+            )
+        ] if entry is not None]
+
+        if len(candidates) == 0:
+            return None
+        target: datetime = parse_wayback_timestamp(timestamp)
+        return min(
+            candidates, key=lambda entry: abs(parse_wayback_timestamp(entry.wayback_data['timestamp']) - target)
+        )
+
+    def get_artifacts(self, wayback_entry: WaybackEntry, extractor: str) -> Optional[Dict]:
+        cursor: Cursor = self.connection.cursor()
+        result: Cursor = cursor.execute(
+            """
+            SELECT artifacts FROM wayback_artifact WHERE download_file_name = ? AND extractor = ?
+            """, (wayback_entry.file_name, extractor)
+        )
+        found = result.fetchall()
+        cursor.close()
+        if len(found) > 0 and found[0][0] is not None:
+            return json.loads(found[0][0])
+        return None
+
+    def add_artifacts(
+            self,
+            wayback_entry: WaybackEntry,
+            extractor: str,
+            extractor_version: str,
+            artifacts: Optional[Dict],
+            error: Optional[str] = None
+    ) -> None:
+        cursor: Cursor = self.connection.cursor()
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO wayback_artifact (
+                download_file_name, extractor, extractor_version, artifacts, error, extracted_at
+            ) VALUES (?,?,?,?,?,?)
+            """, (
+                wayback_entry.file_name, extractor, extractor_version,
+                json.dumps(artifacts) if artifacts is not None else None, error, str(datetime.now())
+            )
+        )
+        cursor.close()
+        self.connection.commit()
+
+    def entries_without_artifacts(
+            self, extractor: str, extractor_version: str, batch_size: int = 1000
+    ) -> Iterable[WaybackEntry]:
+        # Paginate over the rowid, so that artifacts can be added while iterating.
+        last_rowid: int = -1
+        while True:
+            cursor: Cursor = self.connection.cursor()
+            result: Cursor = cursor.execute(
+                """
+                SELECT
+                wayback_entry.rowid,
+                url, success, mime_type, wayback_status, wayback_available, wayback_url, wayback_timestamp,
+                wayback_entry.download_file_name, collected_at, wayback_entry.error, error_type, check_attempts,
+                last_checked, next_check
+                FROM wayback_entry
+                LEFT JOIN wayback_artifact ON (
+                    wayback_artifact.download_file_name = wayback_entry.download_file_name
+                    AND wayback_artifact.extractor = ?
+                )
+                WHERE wayback_entry.rowid > ? AND success = 1
+                AND (wayback_artifact.extractor_version IS NULL OR wayback_artifact.extractor_version != ?)
+                ORDER BY wayback_entry.rowid ASC
+                LIMIT ?
+                """, (extractor, last_rowid, extractor_version, batch_size)
+            )
+            rows: List[Tuple] = result.fetchall()
+            cursor.close()
+            if len(rows) == 0:
+                return
+            for row in rows:
+                yield self.sql_to_wayback_entry(row[1:])
+            last_rowid = rows[-1][0]
+
+    def get_snapshots(self, url: str) -> List[WaybackEntry]:
         cursor: Cursor = self.connection.cursor()
         result: Cursor = cursor.execute(
             """
             SELECT
             url, success, mime_type, wayback_status, wayback_available, wayback_url, wayback_timestamp,
-            download_file_name, collected_at, error, error_type 
+            download_file_name, collected_at, error, error_type, check_attempts, last_checked, next_check
+            FROM wayback_entry
+            WHERE canonical_key = ? AND success = 1
+            ORDER BY wayback_timestamp ASC
+            """, (self.canonical_key(url), )
+        )
+        snapshots: List[WaybackEntry] = [self.sql_to_wayback_entry(row) for row in result.fetchall()]
+        cursor.close()
+        return snapshots
+
+    def retry_due(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> List[WaybackEntry]:
+        cursor: Cursor = self.connection.cursor()
+        result: Cursor = cursor.execute(
+            f"""
+            SELECT
+            url, success, mime_type, wayback_status, wayback_available, wayback_url, wayback_timestamp,
+            download_file_name, collected_at, error, error_type, check_attempts, last_checked, next_check
             FROM wayback_entry
-            WHERE url = ?
-            """, (url, )
+            WHERE {RETRY_DUE_CONDITION}
+            ORDER BY next_check ASC
+            LIMIT ?
+            """, (str(now or datetime.now()), -1 if limit is None else limit)
+        )
+        due: List[WaybackEntry] = [self.sql_to_wayback_entry(row) for row in result.fetchall()]
+        cursor.close()
+        return due
+
+    def count_retry_due(self, now: Optional[datetime] = None) -> int:
+        cursor: Cursor = self.connection.cursor()
+        count: int = cursor.execute(
+            f'SELECT COUNT(*) FROM wayback_entry WHERE {RETRY_DUE_CONDITION}', (str(now or datetime.now()), )
+        ).fetchone()[0]
+        cursor.close()
+        return count
+
+    def record_check(self, wayback_entry: WaybackEntry) -> None:
+        check_attempts: int = (wayback_entry.check_attempts or 0) + 1
+        last_checked: str = str(datetime.now())
+        next_check: Optional[str] = self.recheck_policy.next_check(
+            wayback_entry.error_type, check_attempts, last_checked
+        )
+        cursor: Cursor = self.connection.cursor()
+        cursor.execute(
+            """
+            UPDATE wayback_entry SET check_attempts = ?, last_checked = ?, next_check = ?
+            WHERE canonical_key = ? AND wayback_timestamp IS ? AND success = 0
+            """, (
+                check_attempts, last_checked, next_check, self.canonical_key(wayback_entry.url),
+                wayback_entry.wayback_data['timestamp']
+            )
+        )
+        cursor.close()
+        self.connection.commit()
+
+    def _select_one(self, condition: str, params: Tuple) -> Optional[WaybackEntry]:
+        cursor: Cursor = self.connection.cursor()
+        result: Cursor = cursor.execute(
+            f"""
+            SELECT
+            url, success, mime_type, wayback_status, wayback_available, wayback_url, wayback_timestamp,
+            download_file_name, collected_at, error, error_type, check_attempts, last_checked, next_check 
+            FROM wayback_entry
+            {condition}
+            """, params
         )
 
         found = result.fetchall()
@@ -87,7 +311,8 @@ class SqliteWaybackDB(WaybackDB):
             wayback_entry: WaybackEntry = self.sql_to_wayback_entry(
                 found[0], [
                     'url', 'success', 'mime_type', 'wayback_status', 'wayback_available', 'wayback_url', 'wayback_timestamp',
-                    'download_file_name', 'collected_at', 'error', 'error_type'
+                    'download_file_name', 'collected_at', 'error', 'error_type', 'check_attempts', 'last_checked',
+                    'next_check'
                 ]
             )
             cursor.close()
@@ -100,23 +325,52 @@ class SqliteWaybackDB(WaybackDB):
         cursor: Cursor = self.connection.cursor()
 
         sql_dict: Dict = result_to_sql_dict(result, file_name, url)
+        key: str = self.canonical_key(sql_dict['url'])
+        if sql_dict['success'] == 0:
+            # A URL without any snapshot in Wayback is not stored as failed once a snapshot was collected.
+            if sql_dict['wayback_timestamp'] is None:
+                stored: Optional[WaybackEntry] = self._select_one(
+                    'WHERE canonical_key = ? AND success = 1 ORDER BY collected_at DESC LIMIT 1', (key, )
+                )
+                if stored is not None:
+                    logging.warning(f'Wayback has no snapshot of "{url}", keep the stored snapshots.')
+                    return stored
+
+            if sql_dict['check_attempts'] is None:
+                previous: Optional[WaybackEntry] = self._select_one(
+                    'WHERE canonical_key = ? AND success = 0 AND wayback_timestamp IS ?',
+                    (key, sql_dict['wayback_timestamp'])
+                )
+                sql_dict['check_attempts'] = 1 if previous is None else (previous.check_attempts or 0) + 1
+            sql_dict['next_check'] = self.recheck_policy.next_check(
+                sql_dict['error_type'], sql_dict['check_attempts'], sql_dict['last_checked']
+            )
         values: List[str] = [sql_dict[k] for k in [
             'url', 'success', 'mime_type', 'wayback_status', 'wayback_available', 'wayback_url', 'wayback_timestamp',
-            'download_file_name', 'collected_at', 'error', 'error_type'
-        ]]
+            'download_file_name', 'collected_at', 'error', 'error_type', 'check_attempts', 'last_checked',
+            'next_check'
+        ]] + [key]
+
+        # Failures without a snapshot (at most one per URL) become obsolete once any snapshot was collected. Failures
+        # of a snapshot (e.g. an unsupported mime-type) are unique per snapshot like successful entries.
+        cursor.execute('DELETE FROM wayback_entry WHERE canonical_key = ? AND wayback_timestamp IS NULL', (key, ))
 
+        # Replaces the previous entry of the same snapshot of this URL (or of any equivalent URL).
         cursor.executemany(
             """
             INSERT OR REPLACE INTO wayback_entry (
                 url, success, mime_type, wayback_status, wayback_available, wayback_url, wayback_timestamp,
-                download_file_name, collected_at, error, error_type
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?)
+                download_file_name, collected_at, error, error_type, check_attempts, last_checked, next_check,
+                canonical_key
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
             """, (values, )
         )
         cursor.close()
         self.connection.commit()
 
-        db_entry: WaybackEntry = self.get(url)
+        db_entry: Optional[WaybackEntry] = self._select_one(
+            'WHERE canonical_key = ? AND wayback_timestamp IS ?', (key, sql_dict['wayback_timestamp'])
+        )
         assert db_entry is not None
         return db_entry
 
@@ -130,12 +384,13 @@ class SqliteWaybackDB(WaybackDB):
         cursor.close()
         return is_created
 
-    def _create_db(self) -> None:
+    def _create_db(self, table_name: str = 'wayback_entry') -> None:
+        # Entries are unique per (canonical_key, wayback_timestamp), see _migrate().
         cursor: Cursor = self.connection.cursor()
         cursor.execute(
-            """
-            CREATE TABLE wayback_entry(
-            url TEXT NOT NULL PRIMARY KEY,
+            f"""
+            CREATE TABLE {table_name}(
+            url TEXT NOT NULL,
             success INT NOT NULL,
             mime_type TEXT,
             wayback_status INT,
@@ -145,19 +400,158 @@ class SqliteWaybackDB(WaybackDB):
             download_file_name TEXT,
             collected_at TEXT,
             error TEXT,
-            error_type TEXT
+            error_type TEXT,
+            canonical_key TEXT,
+            check_attempts INT,
+            last_checked TEXT,
+            next_check TEXT
             );
             """
         )
         cursor.close()
 
+    def _migrate(self) -> None:
+        # All steps run in a single transaction (DDL included), so that an interrupted migration leaves the database
+        # unchanged instead of, e.g., without the "wayback_entry" table.
+        if self.connection.in_transaction:
+            self.connection.commit()
+        cursor: Cursor = self.connection.cursor()
+        cursor.execute('BEGIN;')
+        try:
+            self._migrate_tables(cursor)
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.connection.commit()
+
+    def _migrate_tables(self, cursor: Cursor) -> None:
+        cursor.execute('CREATE TABLE IF NOT EXISTS wayback_meta(key TEXT NOT NULL PRIMARY KEY, value TEXT);')
+
+        columns: List[Tuple] = cursor.execute('PRAGMA table_info(wayback_entry);').fetchall()
+        for column_name, column_type in [
+            ('canonical_key', 'TEXT'), ('check_attempts', 'INT'), ('last_checked', 'TEXT'), ('next_check', 'TEXT')
+        ]:
+            if column_name not in [column[1] for column in columns]:
+                cursor.execute(f'ALTER TABLE wayback_entry ADD COLUMN {column_name} {column_type};')
+
+        # Older databases use the URL as primary key, which allows only a single snapshot per URL.
+        url_is_primary_key: bool = any(column[1] == 'url' and column[5] > 0 for column in columns)
+        if url_is_primary_key:
+            logging.info(f'Migrate "{self.db_file_path}" to store multiple snapshots per URL.')
+            # Left over by migrations that were interrupted before this was a single transaction.
+            cursor.execute('DROP TABLE IF EXISTS wayback_entry_migrated;')
+            self._create_db('wayback_entry_migrated')
+            cursor.execute('INSERT INTO wayback_entry_migrated SELECT * FROM wayback_entry;')
+            cursor.execute('DROP TABLE wayback_entry;')
+            cursor.execute('ALTER TABLE wayback_entry_migrated RENAME TO wayback_entry;')
+
+        stored_signature: List[Tuple] = cursor.execute(
+            "SELECT value FROM wayback_meta WHERE key = 'canonicalizer';"
+        ).fetchall()
+        signature: str = self.canonicalizer.signature()
+        is_rekeyed: bool = len(stored_signature) > 0 and stored_signature[0][0] != signature
+        if is_rekeyed and not self.rekey:
+            raise ValueError(
+                f'"{self.db_file_path}" was keyed by a different URL canonicalizer. Re-keying collapses the entries '
+                f'of URLs that become equivalent, which cannot be undone. Pass "rekey=True" to proceed.'
+            )
+        if url_is_primary_key or len(stored_signature) == 0 or is_rekeyed:
+            logging.info(f'Compute canonical keys for "{self.db_file_path}".')
+            self.connection.create_function(
+                'waybacker_canonical_key', 1, self.canonicalizer.canonical_key, deterministic=True
+            )
+            cursor.execute('DROP INDEX IF EXISTS wayback_entry_canonical_key;')
+            cursor.execute('DROP INDEX IF EXISTS wayback_entry_snapshot;')
+            cursor.execute('UPDATE wayback_entry SET canonical_key = waybacker_canonical_key(url);')
+
+            # Failed entries without a snapshot are obsolete for URLs with at least one successful snapshot.
+            cursor.execute(
+                """
+                DELETE FROM wayback_entry
+                WHERE success = 0 AND wayback_timestamp IS NULL
+                AND canonical_key IN (SELECT canonical_key FROM wayback_entry WHERE success = 1);
+                """
+            )
+            num_collapsed: int = cursor.rowcount
+
+            # Keep one entry per canonical key and snapshot: successful entries first, then the earliest collected.
+            cursor.execute(
+                """
+                DELETE FROM wayback_entry WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY canonical_key, wayback_timestamp
+                            ORDER BY success DESC, collected_at ASC, rowid ASC
+                        ) AS rank
+                        FROM wayback_entry
+                    ) WHERE rank > 1
+                );
+                """
+            )
+            num_collapsed += cursor.rowcount
+            if num_collapsed > 0:
+                logging.warning(f'Collapsed {num_collapsed} entries of equivalent URLs in "{self.db_file_path}".')
+
+            cursor.execute(
+                'CREATE UNIQUE INDEX wayback_entry_snapshot ON wayback_entry(canonical_key, wayback_timestamp);'
+            )
+            cursor.execute(
+                "INSERT OR REPLACE INTO wayback_meta (key, value) VALUES ('canonicalizer', ?);", (signature, )
+            )
+
+        # Failed entries of older databases count as checked once, when they were collected.
+        cursor.execute(
+            """
+            UPDATE wayback_entry SET check_attempts = 1, last_checked = collected_at
+            WHERE success = 0 AND check_attempts IS NULL;
+            """
+        )
+        num_unchecked: int = cursor.rowcount
+        stored_policy: List[Tuple] = cursor.execute(
+            "SELECT value FROM wayback_meta WHERE key = 'recheck_policy';"
+        ).fetchall()
+        policy_signature: str = self.recheck_policy.signature()
+        if num_unchecked > 0 or len(stored_policy) == 0 or stored_policy[0][0] != policy_signature:
+            logging.info(f'Compute re-check times for "{self.db_file_path}".')
+            self.connection.create_function(
+                'waybacker_next_check', 3, self.recheck_policy.next_check, deterministic=True
+            )
+            cursor.execute(
+                """
+                UPDATE wayback_entry SET next_check = waybacker_next_check(error_type, check_attempts, last_checked)
+                WHERE success = 0;
+                """
+            )
+            cursor.execute(
+                "INSERT OR REPLACE INTO wayback_meta (key, value) VALUES ('recheck_policy', ?);", (policy_signature, )
+            )
+        cursor.execute('CREATE INDEX IF NOT EXISTS wayback_entry_next_check ON wayback_entry(next_check);')
+
+        # Artifacts derived from the downloaded pages (see waybacker.extraction), one row per page and extractor.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS wayback_artifact(
+            download_file_name TEXT NOT NULL,
+            extractor TEXT NOT NULL,
+            extractor_version TEXT NOT NULL,
+            artifacts TEXT,
+            error TEXT,
+            extracted_at TEXT,
+            PRIMARY KEY (download_file_name, extractor)
+            );
+            """
+        )
+
     def sql_to_wayback_entry(self, sql_row: Tuple, field_names: Optional[List[str]] = None) -> WaybackEntry:
 
         if field_names is None:
             field_names = [
                 'url', 'success', 'mime_type', 'wayback_status', 'wayback_available', 'wayback_url',
                 'wayback_timestamp',
-                'download_file_name', 'collected_at', 'error', 'error_type'
+                'download_file_name', 'collected_at', 'error', 'error_type', 'check_attempts', 'last_checked',
+                'next_check'
             ]
 
         if not len(field_names) == len(sql_row):
@@ -181,5 +575,8 @@ class SqliteWaybackDB(WaybackDB):
                 'timestamp': sql_dict['wayback_timestamp']
             },
             collected_at=sql_dict['collected_at'],
-            download_directory=self.download_directory
+            download_directory=self.download_directory,
+            check_attempts=sql_dict['check_attempts'],
+            last_checked=sql_dict['last_checked'],
+            next_check=sql_dict['next_check']
         )
@@ -1,19 +1,78 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from itertools import islice
 from os.path import join
-from typing import Optional, Dict, Any, Iterable
+from typing import Optional, Dict, Any, Iterable, List, Callable, Iterator, Tuple, Deque
 
 from waybacker.components.wayback_entry import WaybackEntry
-from waybacker.util.file_utils import url_to_file_name, write_text, write_file
+from waybacker.util.file_utils import url_to_file_name, write_text, write_file, map_file
+from waybacker.util.recheck_policy import RecheckPolicy
+from waybacker.util.url_canonicalizer import UrlCanonicalizer
 
 
 class WaybackDB:
-    def __init__(self, directory: str):
+    def __init__(
+            self,
+            directory: str,
+            canonicalizer: Optional[UrlCanonicalizer] = None,
+            recheck_policy: Optional[RecheckPolicy] = None,
+            rekey: bool = False
+    ):
         self.directory: str = directory
         self.download_directory: str = join(directory, 'pages')
+        self.canonicalizer: UrlCanonicalizer = canonicalizer or UrlCanonicalizer()
+        self.recheck_policy: RecheckPolicy = recheck_policy or RecheckPolicy()
+        # Re-keying stored entries with a different canonicalizer collapses entries irreversibly, see _migrate().
+        self.rekey: bool = rekey
+        self.page_hooks: List[Callable[[WaybackEntry], None]] = []
 
         if not self._is_created():
             self._create_db()
+        self._migrate()
 
-    def get(self, url: str) -> Optional[WaybackEntry]:
+    def canonical_key(self, url: str) -> str:
+        return self.canonicalizer.canonical_key(url)
+
+    def get(self, url: str, timestamp: Optional[str] = None) -> Optional[WaybackEntry]:
+        """
+        Get the entry of the snapshot with the exact Wayback timestamp. If no timestamp is provided, the most recently
+        collected entry is returned (successful entries are preferred, failures for a requested time are ignored).
+        """
+        raise NotImplementedError()
+
+    def get_nearest(self, url: str, timestamp: str) -> Optional[WaybackEntry]:
+        """
+        Get the stored successful snapshot that is closest to the Wayback timestamp, without contacting Wayback.
+        """
+        raise NotImplementedError()
+
+    def get_snapshots(self, url: str) -> List[WaybackEntry]:
+        """
+        Get all stored successful snapshots of the URL, ordered by their Wayback timestamp.
+        """
+        raise NotImplementedError()
+
+    def retry_due(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> List[WaybackEntry]:
+        """
+        Get failed entries that are due for a re-check according to the re-check policy, the longest overdue first.
+        Failed entries of URLs with a successful snapshot are never due.
+        """
+        raise NotImplementedError()
+
+    def count_retry_due(self, now: Optional[datetime] = None) -> int:
+        """
+        Count the failed entries that retry_due() would return.
+        """
+        raise NotImplementedError()
+
+    def record_check(self, wayback_entry: WaybackEntry) -> None:
+        """
+        Count another unsuccessful check of the failed entry (e.g. if re-checking it stored a different snapshot) and
+        schedule its next re-check accordingly.
+        """
         raise NotImplementedError()
 
     def add_webpage(self, url: str, result: Dict) -> WaybackEntry:
@@ -21,7 +80,38 @@ class WaybackDB:
         if result['success']:
             file_name = self.store_webpage(url, result['content'], result['mime_type'])
 
-        return self.add_webpage_entry(url, result, file_name)
+        wayback_entry: WaybackEntry = self.add_webpage_entry(url, result, file_name)
+        for hook in self.page_hooks:
+            hook(wayback_entry)
+        return wayback_entry
+
+    def add_page_hook(self, hook: Callable[[WaybackEntry], None]) -> None:
+        """
+        Register a function that is called with every entry added via add_webpage() (e.g. to extract its content).
+        """
+        self.page_hooks.append(hook)
+
+    def get_artifacts(self, wayback_entry: WaybackEntry, extractor: str) -> Optional[Dict]:
+        """
+        Get the stored artifacts (e.g. title or text) that the extractor derived from the page of the entry.
+        """
+        raise NotImplementedError()
+
+    def add_artifacts(
+            self,
+            wayback_entry: WaybackEntry,
+            extractor: str,
+            extractor_version: str,
+            artifacts: Optional[Dict],
+            error: Optional[str] = None
+    ) -> None:
+        raise NotImplementedError()
+
+    def entries_without_artifacts(self, extractor: str, extractor_version: str) -> Iterable[WaybackEntry]:
+        """
+        Get all successful entries without artifacts of this extractor version (missing or from another version).
+        """
+        raise NotImplementedError()
 
     def add_webpage_entry(self, url: str, result: Dict, file_name: str) -> WaybackEntry:
         raise NotImplementedError()
@@ -32,12 +122,22 @@ class WaybackDB:
     def _create_db(self) -> None:
         raise NotImplementedError()
 
+    def _migrate(self) -> None:
+        """
+        Bring an existing database up to date, e.g. compute canonical keys and collapse entries of equivalent URLs.
+        If the keys were computed by a different canonicalizer, they are only re-computed if "rekey" is set.
+        """
+        raise NotImplementedError()
+
     def entries(self) -> Iterable[WaybackEntry]:
         raise NotImplementedError()
 
     def copy_wayback_entry(self, entry_other: WaybackEntry, pages_directory_other: str):
         raise NotImplementedError()
 
+    def close(self) -> None:
+        pass
+
     def store_webpage(self, url: str, content: Any, mime_type: str) -> str:
         assert mime_type in {'pdf', 'html'}
         file_name: str = url_to_file_name(url, mime_type)
@@ -49,3 +149,77 @@ class WaybackDB:
             write_file(file_path, content)
 
         return file_name
+
+    def iter_pages(
+            self,
+            entry_filter: Optional[Callable[[WaybackEntry], bool]] = None,
+            batch_size: int = 64,
+            num_workers: int = 4,
+            prefetch_batches: int = 2,
+            layout_window: int = 4096
+    ) -> Iterator[List[Tuple[WaybackEntry, memoryview]]]:
+        """
+        Iterate over the downloaded pages of all successful entries in batches. Pages are memory-mapped (no copy into
+        Python objects) by a thread pool that prefetches the upcoming batches. Within windows of "layout_window"
+        entries, files are read in the order of their on-disk layout (inode number) to reduce seeking.
+
+        :param entry_filter: If provided, only pages of entries for which it returns true are read.
+        :param batch_size: Number of pages per yielded batch.
+        :param num_workers: Number of threads that map and prefetch files.
+        :param prefetch_batches: Number of batches that are prefetched ahead of the consumer.
+        :param layout_window: Number of entries that are ordered by on-disk layout at once (bounds the memory).
+        """
+        entries: Iterator[WaybackEntry] = (
+            entry for entry in self.entries() if entry.success and (entry_filter is None or entry_filter(entry))
+        )
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            pending: Deque[Tuple[WaybackEntry, Future]] = deque()
+            batch: List[Tuple[WaybackEntry, memoryview]] = []
+            max_pending: int = batch_size * prefetch_batches
+
+            for entry in self._order_by_layout(entries, executor, layout_window):
+                pending.append((entry, executor.submit(map_file, entry.full_path)))
+                while len(pending) > max_pending:
+                    batch = self._collect_page(pending, batch)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+
+            while len(pending) > 0:
+                batch = self._collect_page(pending, batch)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+            if len(batch) > 0:
+                yield batch
+
+    @staticmethod
+    def _collect_page(
+            pending: Deque[Tuple[WaybackEntry, Future]], batch: List[Tuple[WaybackEntry, memoryview]]
+    ) -> List[Tuple[WaybackEntry, memoryview]]:
+        entry, future = pending.popleft()
+        try:
+            batch.append((entry, future.result()))
+        except OSError as err:
+            logging.warning(f'Cannot read page of "{entry.url}": {err}')
+        return batch
+
+    @staticmethod
+    def _order_by_layout(
+            entries: Iterator[WaybackEntry], executor: ThreadPoolExecutor, layout_window: int
+    ) -> Iterator[WaybackEntry]:
+        def inode(entry: WaybackEntry) -> int:
+            try:
+                return os.stat(entry.full_path).st_ino
+            except OSError:
+                return 0
+
+        while True:
+            window: List[WaybackEntry] = list(islice(entries, layout_window))
+            if len(window) == 0:
+                return
+            inodes: List[int] = list(executor.map(inode, window))
+            for _, entry in sorted(zip(inodes, window), key=lambda pair: pair[0]):
+                yield entry
@@ -0,0 +1,122 @@
+import io
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urldefrag
+
+from waybacker.components.wayback_entry import WaybackEntry
+
+# Elements that do not contribute to the main text of a webpage.
+BOILERPLATE_TAGS: List[str] = ['script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside', 'form']
+
+
+def clean_text(text: str) -> str:
+    """
+    Collapse whitespace within lines and remove empty lines.
+
+    Parameters
+    ----------
+        text: str
+            The raw text.
+
+    Return
+    ------
+        text: str
+            The cleaned text.
+    """
+    lines: List[str] = [' '.join(line.split()) for line in text.splitlines()]
+    return '\n'.join(line for line in lines if len(line) > 0)
+
+
+class Extractor:
+    """
+    Derives artifacts (e.g. title or text) from the downloaded page of an entry. Extractors are sent to worker
+    processes and must therefore be picklable. Increase the version whenever the produced artifacts change, so that
+    stored artifacts are re-computed.
+    """
+
+    name: str = ''
+    version: str = ''
+
+    def supports(self, wayback_entry: WaybackEntry) -> bool:
+        raise NotImplementedError()
+
+    def extract(self, content: bytes, url: str) -> Dict:
+        """
+        Compute the artifacts of a page.
+
+        Parameters
+        -----------
+            content: bytes
+                The content of the downloaded page.
+
+            url: str
+                The live URL of the page (e.g. to resolve relative links).
+
+        Return
+        -------
+            artifacts: dict
+                JSON serializable artifacts.
+        """
+        raise NotImplementedError()
+
+
+class HtmlExtractor(Extractor):
+    """
+    Extracts the title, the clean text (without scripts, navigation, etc.) and the outgoing links of HTML pages.
+    """
+
+    name: str = 'html'
+    version: str = '1'
+
+    def supports(self, wayback_entry: WaybackEntry) -> bool:
+        return wayback_entry.success and wayback_entry.mime_type == 'html'
+
+    def extract(self, content: bytes, url: str) -> Dict:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content.decode('utf-8', errors='replace'), features='html.parser')
+
+        title: Optional[str] = None
+        if soup.title is not None and soup.title.string is not None:
+            title = clean_text(soup.title.string)
+        else:
+            og_title = soup.find('meta', attrs={'property': 'og:title'})
+            if og_title is not None and og_title.get('content'):
+                title = clean_text(og_title['content'])
+
+        outlinks: List[str] = []
+        for link in soup.find_all('a', href=True):
+            href: str = urldefrag(urljoin(url, link['href'].strip()))[0]
+            if href.startswith('http://') or href.startswith('https://'):
+                outlinks.append(href)
+
+        for tag in soup(BOILERPLATE_TAGS):
+            tag.decompose()
+
+        return {
+            'title': title,
+            'text': clean_text(soup.get_text(separator='\n')),
+            # Unique links in order of their first occurrence.
+            'outlinks': list(dict.fromkeys(outlinks))
+        }
+
+
+class PdfExtractor(Extractor):
+    """
+    Extracts the title (from the metadata) and the text of PDF files. Requires "pypdf".
+    """
+
+    name: str = 'pdf'
+    version: str = '1'
+
+    def supports(self, wayback_entry: WaybackEntry) -> bool:
+        return wayback_entry.success and wayback_entry.mime_type == 'pdf'
+
+    def extract(self, content: bytes, url: str) -> Dict:
+        from pypdf import PdfReader
+
+        reader = PdfReader(io.BytesIO(content))
+        title: Optional[str] = reader.metadata.title if reader.metadata is not None else None
+        return {
+            'title': clean_text(title) if title else None,
+            'text': '\n\n'.join(clean_text(page.extract_text() or '') for page in reader.pages)
+        }
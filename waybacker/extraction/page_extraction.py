@@ -0,0 +1,163 @@
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from importlib.util import find_spec
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from waybacker.components.wayback_entry import WaybackEntry
+from waybacker.db.wayback_db import WaybackDB
+from waybacker.extraction.extractors import Extractor, HtmlExtractor, PdfExtractor
+
+
+def get_default_extractors() -> List[Extractor]:
+    """
+    The HTML extractor, and the PDF extractor if "pypdf" is installed.
+    """
+    extractors: List[Extractor] = [HtmlExtractor()]
+    if find_spec('pypdf') is not None:
+        extractors.append(PdfExtractor())
+    return extractors
+
+
+def extract_file(extractor: Extractor, src: str, url: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Run the extractor on a downloaded page. Errors of the extractor (e.g. malformed files) are returned instead of
+    raised, so that they are stored and the page is not parsed again. Missing dependencies and errors reading the file
+    (e.g. a temporarily missing file) are raised, so that the page is extracted again later.
+
+    Parameters
+    -----------
+        extractor: Extractor
+            The extractor to run.
+
+        src: str
+            Path of the downloaded page.
+
+        url: str
+            The live URL of the page.
+
+    Return
+    -------
+        result: tuple
+            The artifacts (or None) and the error message (or None).
+    """
+    with open(src, 'rb') as f_in:
+        content: bytes = f_in.read()
+    try:
+        return extractor.extract(content, url), None
+    except ImportError:
+        raise
+    except Exception as err:
+        return None, f'{type(err).__name__}: {err}'
+
+
+class PageExtraction:
+    """
+    Computes artifacts (e.g. title, clean text, outgoing links) of downloaded pages once and stores them next to the
+    entries in the WaybackDB. Each page is parsed once per extractor version, not once per consumer.
+    """
+
+    def __init__(
+            self,
+            wayback_db: WaybackDB,
+            extractors: Optional[List[Extractor]] = None,
+            num_processes: Optional[int] = None
+    ):
+        """
+        Parameters
+        -----------
+            wayback_db: WaybackDB
+                The database whose pages are extracted, and where the artifacts are stored.
+
+            extractors: list (optional)
+                The extractors to run (default: HTML, and PDF if "pypdf" is installed).
+
+            num_processes: int (optional)
+                Number of worker processes of run() (default: number of CPUs).
+        """
+        self.wayback_db: WaybackDB = wayback_db
+        self.extractors: List[Extractor] = extractors if extractors is not None else get_default_extractors()
+        self.num_processes: int = num_processes or os.cpu_count() or 1
+
+    def run(self, on_result: Optional[Callable[[WaybackEntry, str, bool], None]] = None) -> Counter:
+        """
+        Extract all pages that have no artifacts of the current extractor versions yet. Pages are parsed by a
+        process pool, results are stored as they arrive, so that an interrupted run continues where it stopped.
+
+        :param on_result: Called with the entry, the extractor name, and whether the extraction succeeded.
+        :return: Number of successful, failed and skipped (unreadable page) extractions.
+        """
+        counts: Counter = Counter()
+        max_pending: int = self.num_processes * 4
+        pending: Dict[Future, Tuple[WaybackEntry, Extractor]] = {}
+
+        def collect(done: Iterable[Future]) -> None:
+            for future in done:
+                wayback_entry, extractor = pending.pop(future)
+                try:
+                    artifacts, error = future.result()
+                except OSError as err:
+                    # Nothing is stored, so the page is extracted by the next run.
+                    logging.warning(f'Cannot read page of "{wayback_entry.url}": {err}')
+                    counts['skipped'] += 1
+                    continue
+                self.wayback_db.add_artifacts(wayback_entry, extractor.name, extractor.version, artifacts, error)
+                if error is not None:
+                    logging.warning(f'Extraction "{extractor.name}" failed for "{wayback_entry.url}": {error}')
+                counts['extracted' if error is None else 'errors'] += 1
+                if on_result is not None:
+                    on_result(wayback_entry, extractor.name, error is None)
+
+        with ProcessPoolExecutor(max_workers=self.num_processes) as executor:
+            for extractor in self.extractors:
+                for wayback_entry in self.wayback_db.entries_without_artifacts(extractor.name, extractor.version):
+                    if not extractor.supports(wayback_entry):
+                        continue
+                    future: Future = executor.submit(
+                        extract_file, extractor, wayback_entry.full_path, wayback_entry.url
+                    )
+                    pending[future] = (wayback_entry, extractor)
+                    if len(pending) >= max_pending:
+                        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                        collect(done)
+            collect(wait(list(pending)).done)
+
+        return counts
+
+    def extract(self, wayback_entry: WaybackEntry) -> Dict[str, Dict]:
+        """
+        Extract a single page in this process and store the artifacts.
+
+        :param wayback_entry: The entry whose page is extracted.
+        :return: The artifacts per extractor name (extractors that failed are omitted).
+        """
+        results: Dict[str, Dict] = {}
+        for extractor in self.extractors:
+            if not extractor.supports(wayback_entry):
+                continue
+            try:
+                artifacts, error = extract_file(extractor, wayback_entry.full_path, wayback_entry.url)
+            except OSError as err:
+                logging.warning(f'Cannot read page of "{wayback_entry.url}": {err}')
+                continue
+            self.wayback_db.add_artifacts(wayback_entry, extractor.name, extractor.version, artifacts, error)
+            if artifacts is not None:
+                results[extractor.name] = artifacts
+        return results
+
+    def attach(self) -> None:
+        """
+        Extract every page that is newly added to the WaybackDB (e.g. via Waybacker.get()) right away.
+        """
+        self.wayback_db.add_page_hook(self._on_page_added)
+
+    def get(self, wayback_entry: WaybackEntry, extractor: str) -> Optional[Dict]:
+        """
+        Get the stored artifacts of an entry, e.g. get(entry, "html")["text"].
+        """
+        return self.wayback_db.get_artifacts(wayback_entry, extractor)
+
+    def _on_page_added(self, wayback_entry: WaybackEntry) -> None:
+        if wayback_entry.success:
+            self.extract(wayback_entry)
@@ -1,10 +1,11 @@
 import os
 from os.path import join
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-from waybacker.db.sqlite_wayback_db import SqliteWaybackDB
 from waybacker.db.wayback_db import WaybackDB
+from waybacker.util.recheck_policy import RecheckPolicy
+from waybacker.util.url_canonicalizer import UrlCanonicalizer
 
 
 def get_default_initialization() -> Dict:
@@ -28,8 +29,32 @@ def get_default_initialization() -> Dict:
     }
 
 
-def get_wayback_db(db_backend: str, directory: str) -> WaybackDB:
+def get_wayback_db(
+        db_backend: str,
+        directory: str,
+        canonicalizer: Optional[UrlCanonicalizer] = None,
+        recheck_policy: Optional[RecheckPolicy] = None,
+        rekey: bool = False
+) -> WaybackDB:
     if db_backend == 'sqlite':
-        return SqliteWaybackDB(directory)
+        from waybacker.db.sqlite_wayback_db import SqliteWaybackDB
+        return SqliteWaybackDB(directory, canonicalizer, recheck_policy, rekey)
+    else:
+        raise ValueError(f'"db_backend" must be one of: "sqlite"!')
+
+
+def get_wayback_db_copy(
+        db_backend: str,
+        directory: str,
+        canonicalizer: Optional[UrlCanonicalizer] = None,
+        recheck_policy: Optional[RecheckPolicy] = None
+) -> WaybackDB:
+    """
+    Open a temporary copy of an existing database, so that reading from it (e.g. to merge it) never migrates or
+    otherwise modifies the original. Call close() on the result to remove the copy.
+    """
+    if db_backend == 'sqlite':
+        from waybacker.db.sqlite_wayback_db import SqliteWaybackDB
+        return SqliteWaybackDB.open_copy(directory, canonicalizer, recheck_policy)
     else:
         raise ValueError(f'"db_backend" must be one of: "sqlite"!')
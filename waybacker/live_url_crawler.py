@@ -1,12 +1,14 @@
 import json
 import logging
 from datetime import datetime
-from typing import List, Iterable, Optional
+from typing import List, Iterable, Optional, TYPE_CHECKING
 
-import requests
-from bs4 import BeautifulSoup, Tag
 from waybacker.util.requester import get_with_retry
 
+if TYPE_CHECKING:
+    import requests
+    from bs4 import Tag
+
 
 class UrlEntry:
     """
@@ -81,6 +83,8 @@ class LiveURLCollector:
             result: List
                 The collected links.
         """
+        from bs4 import BeautifulSoup
+
         found_urls: bool = True
         current_page_index: int = self.start_page_index
         current_page_count: int = 0
@@ -88,10 +92,10 @@ class LiveURLCollector:
             current_overview_page_url: str = self.overview_iterator.replace('@@PAGE@@', str(current_page_index))
 
             logging.info(f'[{datetime.now()}] request {current_overview_page_url}')
-            result: requests.Response = get_with_retry(current_overview_page_url, num_retries=5, num_delay=60*5)
+            result: 'requests.Response' = get_with_retry(current_overview_page_url, num_retries=5, num_delay=60*5)
 
             soup = BeautifulSoup(result.text, features='html.parser')
-            link_entries: List[Tag] = soup.select(self.link_query)
+            link_entries: List['Tag'] = soup.select(self.link_query)
 
             urls_on_page: Iterable[str] = map(lambda a: a['href'].strip(), link_entries)
             urls_on_page: List[str] = list(filter(lambda a: len(a) > 0, urls_on_page))
@@ -100,8 +104,9 @@ class LiveURLCollector:
 
             for url in urls_on_page:
                 current_page_count += 1
-                if current_page_count <= max_links:
-                    yield UrlEntry(url, current_page_index, current_overview_page_url)
+                if max_links is not None and current_page_count > max_links:
+                    return
+                yield UrlEntry(url, current_page_index, current_overview_page_url)
 
             current_page_index += 1
 
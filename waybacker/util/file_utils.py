@@ -1,5 +1,7 @@
 import codecs
 import json
+import mmap
+import os
 from datetime import datetime
 from typing import Dict, Any
 
@@ -109,3 +111,29 @@ def write_file(dest: str, content: Any):
     """
     with codecs.open(dest, 'wb') as f_out:
         f_out.write(content)
+
+
+def map_file(src: str) -> memoryview:
+    """
+    Memory-map a file read-only and ask the OS to read it ahead. The content is only copied into memory when (and as
+    far as) the returned buffer is accessed.
+
+    Parameters
+    ----------
+        src: str
+            The file path of the file to map.
+
+    Return
+    ------
+        buffer: memoryview
+            A read-only view of the file content. The mapping is released once the view is garbage collected.
+    """
+    with open(src, 'rb') as f_in:
+        if os.fstat(f_in.fileno()).st_size == 0:
+            # Empty files cannot be mapped.
+            return memoryview(b'')
+        mapped: mmap.mmap = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+        mapped.madvise(mmap.MADV_WILLNEED)
+    return memoryview(mapped)
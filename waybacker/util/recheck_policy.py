@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+DEFAULT_INTERVALS: Dict[str, timedelta] = {
+    # A URL that is not archived yet may be archived later.
+    'unavailable': timedelta(days=30),
+    # The archived snapshot is neither HTML nor PDF, only a newer snapshot may change this.
+    'mime-type': timedelta(days=365),
+    # Wayback has no snapshot close to the requested time, older snapshots are rarely added later.
+    'out-of-tolerance': timedelta(days=365)
+}
+
+
+class RecheckPolicy:
+    """
+    Decides when a failed entry is worth re-checking in Wayback. The first re-check is due after the interval of the
+    error type. Every further unsuccessful attempt multiplies the interval by "backoff_factor" (up to "max_interval").
+    """
+
+    def __init__(
+            self,
+            intervals: Optional[Dict[str, timedelta]] = None,
+            default_interval: timedelta = timedelta(days=30),
+            backoff_factor: float = 2.0,
+            max_interval: timedelta = timedelta(days=730),
+            max_attempts: Optional[int] = None
+    ):
+        """
+        Parameters
+        -----------
+            intervals: dict (optional)
+                Interval until the first re-check, per error type (default: 30 days for "unavailable" and 365 days
+                for "mime-type" and "out-of-tolerance").
+
+            default_interval: timedelta
+                Interval until the first re-check of error types not listed in "intervals" (default is 30 days).
+
+            backoff_factor: float
+                Factor by which the interval grows after each unsuccessful attempt (default is 2).
+
+            max_interval: timedelta
+                Upper bound of the interval (default is 730 days).
+
+            max_attempts: int (optional)
+                If provided, entries are never re-checked after this many unsuccessful attempts.
+        """
+        self.intervals: Dict[str, timedelta] = dict(DEFAULT_INTERVALS if intervals is None else intervals)
+        self.default_interval: timedelta = default_interval
+        self.backoff_factor: float = backoff_factor
+        self.max_interval: timedelta = max_interval
+        self.max_attempts: Optional[int] = max_attempts
+
+        if any(interval <= timedelta(0) for interval in [*self.intervals.values(), self.default_interval]):
+            raise ValueError(f'Re-check intervals must be positive!')
+        if self.backoff_factor < 1:
+            raise ValueError(f'"backoff_factor" cannot be smaller than 1!')
+
+    def signature(self) -> str:
+        """
+        Serialized configuration. Stored re-check times must be recomputed whenever the signature changes.
+        """
+        return json.dumps({
+            'intervals': {error_type: interval.total_seconds() for error_type, interval in self.intervals.items()},
+            'default_interval': self.default_interval.total_seconds(),
+            'backoff_factor': self.backoff_factor,
+            'max_interval': self.max_interval.total_seconds(),
+            'max_attempts': self.max_attempts
+        }, sort_keys=True)
+
+    def interval(self, error_type: Optional[str], attempts: int) -> timedelta:
+        base: timedelta = self.intervals.get(error_type, self.default_interval)
+        # The exponent is bounded to avoid overflows, the result is bounded by max_interval anyway.
+        seconds: float = base.total_seconds() * self.backoff_factor ** min(max(attempts - 1, 0), 64)
+        return timedelta(seconds=min(seconds, self.max_interval.total_seconds()))
+
+    def next_check(self, error_type: Optional[str], attempts: int, last_checked: str) -> Optional[str]:
+        """
+        Compute when a failed entry is due for the next re-check.
+
+        Parameters
+        -----------
+            error_type: str
+                The error type of the failed entry (e.g. "unavailable").
+
+            attempts: int
+                Number of unsuccessful attempts so far.
+
+            last_checked: str
+                When Wayback was queried last (as stored in the database).
+
+        Return
+        -------
+            next_check: str (optional)
+                The time of the next re-check, or None if the entry should never be re-checked.
+        """
+        if self.max_attempts is not None and attempts >= self.max_attempts:
+            return None
+        return str(datetime.fromisoformat(last_checked) + self.interval(error_type, attempts))
@@ -1,8 +1,9 @@
 import logging
-from typing import Callable, Any
+from typing import Callable, Any, TYPE_CHECKING
 import time
 
-import requests
+if TYPE_CHECKING:
+    import requests
 
 
 def retry_with_delay(fn: Callable, num_retries: int, num_delay: int) -> Any:
@@ -38,7 +39,7 @@ def retry_with_delay(fn: Callable, num_retries: int, num_delay: int) -> Any:
     raise error
 
 
-def get_with_retry(url: str, num_retries: int, num_delay: int) -> requests.Response:
+def get_with_retry(url: str, num_retries: int, num_delay: int) -> 'requests.Response':
     """
     Send a GET request to the specified url and allow errors.
 
@@ -55,6 +56,8 @@ def get_with_retry(url: str, num_retries: int, num_delay: int) -> requests.Respo
             object from the GET request.
 
     """
+    import requests
+
     logging.info(f'GET Request: {url}')
     return retry_with_delay(
         lambda: requests.get(url), num_retries, num_delay
@@ -0,0 +1,177 @@
+import json
+import re
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit, quote
+
+DEFAULT_TRACKING_PARAMS: Tuple[str, ...] = (
+    'utm_*', 'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl'
+)
+
+UNRESERVED_CHARACTERS: str = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~'
+
+# Characters that are kept as-is when re-quoting a path or query component.
+SAFE_CHARACTERS: str = "%/:@!$&'()*+,;=-._~"
+
+PERCENT_ESCAPE: re.Pattern = re.compile(r'%([0-9A-Fa-f]{2})')
+WWW_PREFIX: re.Pattern = re.compile(r'^www\d*\.')
+DEFAULT_PORTS: Tuple[str, ...] = ('80', '443')
+
+
+def normalize_percent_encoding(value: str) -> str:
+    """
+    Decode percent escapes of unreserved characters, upper-case all remaining escapes and quote characters that
+    must not appear unescaped in a URL. Equivalent encodings of the same URL component result in the same string.
+
+    Parameters
+    ----------
+        value: str
+            A path or query component.
+
+    Return
+    ------
+        normalized: str
+            The component with normalized percent-encoding.
+    """
+    def _replace(match: re.Match) -> str:
+        char: str = chr(int(match.group(1), 16))
+        if char in UNRESERVED_CHARACTERS:
+            return char
+        return f'%{match.group(1).upper()}'
+
+    return quote(PERCENT_ESCAPE.sub(_replace, value), safe=SAFE_CHARACTERS)
+
+
+class UrlCanonicalizer:
+    """
+    Computes canonical keys for URLs, so that equivalent URLs (e.g. "http://" vs "https://", "www." vs bare host or a
+    different order of query parameters) map to the same key. Keys follow the SURT format used by the Wayback Machine,
+    e.g. "https://www.Example.org/a?b=2&a=1" becomes "org,example)/a?a=1&b=2".
+    """
+
+    def __init__(
+            self,
+            ignore_scheme: bool = True,
+            strip_www: bool = True,
+            strip_default_port: bool = True,
+            strip_trailing_slash: bool = True,
+            sort_query: bool = True,
+            normalize_encoding: bool = True,
+            tracking_params: Optional[Iterable[str]] = DEFAULT_TRACKING_PARAMS
+    ):
+        """
+        Parameters
+        -----------
+            ignore_scheme: bool
+                If set to true, "http" and "https" URLs map to the same key (default is true).
+
+            strip_www: bool
+                If set to true, "www." (and "www2." etc.) prefixes of the host are ignored (default is true).
+
+            strip_default_port: bool
+                If set to true, ports 80 and 443 are ignored (default is true).
+
+            strip_trailing_slash: bool
+                If set to true, a trailing slash of the path is ignored (default is true).
+
+            sort_query: bool
+                If set to true, query parameters are sorted (default is true).
+
+            normalize_encoding: bool
+                If set to true, percent-encoding differences are ignored (default is true).
+
+            tracking_params: Iterable (optional)
+                Names of query parameters that are dropped. A trailing "*" matches any suffix (default includes
+                "utm_*", "fbclid" and "gclid"). Matching is case-insensitive.
+        """
+        self.ignore_scheme: bool = ignore_scheme
+        self.strip_www: bool = strip_www
+        self.strip_default_port: bool = strip_default_port
+        self.strip_trailing_slash: bool = strip_trailing_slash
+        self.sort_query: bool = sort_query
+        self.normalize_encoding: bool = normalize_encoding
+        self.tracking_params: List[str] = sorted(param.lower() for param in (tracking_params or []))
+
+    def signature(self) -> str:
+        """
+        Serialized configuration. Stored keys must be recomputed whenever the signature changes.
+        """
+        return json.dumps({
+            'ignore_scheme': self.ignore_scheme,
+            'strip_www': self.strip_www,
+            'strip_default_port': self.strip_default_port,
+            'strip_trailing_slash': self.strip_trailing_slash,
+            'sort_query': self.sort_query,
+            'normalize_encoding': self.normalize_encoding,
+            'tracking_params': self.tracking_params
+        }, sort_keys=True)
+
+    def canonical_key(self, url: str) -> str:
+        """
+        Compute the SURT-style canonical key of a URL.
+
+        Parameters
+        -----------
+            url: str
+                The URL to canonicalize.
+
+        Return
+        -------
+            key: str
+                The canonical key. Equivalent URLs have the same key. URLs that cannot be parsed (e.g. invalid ports)
+                are their own key (the stripped URL).
+        """
+        try:
+            return self._surt_key(url.strip())
+        except ValueError:
+            return url.strip()
+
+    def _surt_key(self, url: str) -> str:
+        if '://' not in url:
+            url = f'http://{url}'
+
+        parts = urlsplit(url)
+        host: str = (parts.hostname or '').rstrip('.')
+        if self.strip_www:
+            host = WWW_PREFIX.sub('', host)
+
+        surt_host: str = ','.join(reversed(host.split('.')))
+        port: Optional[int] = parts.port
+        if port is not None and not (self.strip_default_port and str(port) in DEFAULT_PORTS):
+            surt_host += f':{port}'
+        if not self.ignore_scheme:
+            surt_host = f'{parts.scheme.lower()}://({surt_host}'
+
+        path: str = parts.path
+        if self.normalize_encoding:
+            path = normalize_percent_encoding(path)
+        if self.strip_trailing_slash:
+            path = path.rstrip('/')
+        if not path.startswith('/'):
+            path = f'/{path}'
+
+        query: str = self._canonical_query(parts.query)
+        return f'{surt_host}){path}' + (f'?{query}' if len(query) > 0 else '')
+
+    def _canonical_query(self, query: str) -> str:
+        params: List[str] = []
+        for param in query.split('&'):
+            if len(param) == 0:
+                continue
+            if self.normalize_encoding:
+                param = '='.join(normalize_percent_encoding(part) for part in param.split('=', 1))
+            if not self._is_tracking_param(param.split('=', 1)[0]):
+                params.append(param)
+
+        if self.sort_query:
+            params = sorted(params)
+        return '&'.join(params)
+
+    def _is_tracking_param(self, name: str) -> bool:
+        name = name.lower()
+        for param in self.tracking_params:
+            if param.endswith('*'):
+                if name.startswith(param[:-1]):
+                    return True
+            elif name == param:
+                return True
+        return False
@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Union
+
+WAYBACK_TIMESTAMP_FORMAT: str = '%Y%m%d%H%M%S'
+
+# Used to complete partial timestamps (e.g. "2020" or "202003") to the earliest valid point in time.
+TIMESTAMP_PADDING: str = '19700101000000'
+
+
+def to_wayback_timestamp(value: Union[str, datetime]) -> str:
+    """
+    Convert a point in time into the 14-digit timestamp format used by Wayback (YYYYMMDDhhmmss).
+
+    Parameters
+    ----------
+        value: str or datetime
+            A datetime or a (possibly partial) Wayback timestamp, e.g. "2020", "20200315" or "20200315120000".
+
+    Return
+    ------
+        timestamp: str
+            The complete 14-digit Wayback timestamp.
+    """
+    if isinstance(value, datetime):
+        return value.strftime(WAYBACK_TIMESTAMP_FORMAT)
+
+    value = value.strip()
+    if not value.isdigit() or len(value) < 4 or len(value) > 14:
+        raise ValueError(f'Invalid Wayback timestamp: "{value}"!')
+
+    timestamp: str = value + TIMESTAMP_PADDING[len(value):]
+    parse_wayback_timestamp(timestamp)
+    return timestamp
+
+
+def parse_wayback_timestamp(timestamp: str) -> datetime:
+    """
+    Parse a 14-digit Wayback timestamp (YYYYMMDDhhmmss) into a datetime.
+    """
+    return datetime.strptime(timestamp, WAYBACK_TIMESTAMP_FORMAT)
@@ -1,13 +1,17 @@
 import logging
-from typing import Optional, Dict, List, Iterable
-
-import pandas as pd
-from tqdm import tqdm
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Iterable, Iterator, Union, TYPE_CHECKING
 
 from waybacker.api.wayback_requester import WaybackRequester
 from waybacker.components.wayback_entry import WaybackEntry
 from waybacker.db.wayback_db import WaybackDB
 from waybacker.init.initialization import get_default_initialization, get_wayback_db
+from waybacker.util.recheck_policy import RecheckPolicy
+from waybacker.util.url_canonicalizer import UrlCanonicalizer
+from waybacker.util.wayback_timestamp import to_wayback_timestamp, parse_wayback_timestamp
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def normalize_url(url: str) -> str:
@@ -26,37 +30,94 @@ class Waybacker:
             self,
             directory: Optional[str] = None,
             db_backend: Optional[str] = None,
-            sleep_time_seconds: Optional[int] = None
+            sleep_time_seconds: Optional[int] = None,
+            canonicalizer: Optional[UrlCanonicalizer] = None,
+            timestamp_tolerance: timedelta = timedelta(days=30),
+            recheck_policy: Optional[RecheckPolicy] = None,
+            rekey: bool = False
     ):
         """
         Initialize the waybacker.
         :param directory: Directory that will contain the database and all downloaded webpages.
         :param db_backend: Either 'sqlite' or 'json'.
         :param sleep_time_seconds: Seconds to wait before querying wayback.
+        :param canonicalizer: Decides which URLs are equivalent and share one entry (default: UrlCanonicalizer()).
+        :param timestamp_tolerance: Default maximum distance between a requested timestamp and a stored snapshot.
+        :param recheck_policy: Decides when failed entries are due for a re-check (default: RecheckPolicy()).
+        :param rekey: If set to true, stored entries are re-keyed if the canonicalizer differs from the one that keyed
+            the database. Entries of URLs that become equivalent are collapsed, which cannot be undone. Otherwise, a
+            different canonicalizer raises a ValueError.
         """
         # Setup parameters
         default_arguments: Dict = get_default_initialization()
         self.directory: str = directory or default_arguments['directory']
         self.sleep_time_seconds: int = sleep_time_seconds or default_arguments['sleep_time_seconds']
+        self.timestamp_tolerance: timedelta = timestamp_tolerance
 
         self._validate()
 
         db_backend: str = db_backend or default_arguments['db_backend']
-        self.wayback_db: WaybackDB = get_wayback_db(db_backend=db_backend, directory=self.directory)
+        self.wayback_db: WaybackDB = get_wayback_db(
+            db_backend=db_backend, directory=self.directory, canonicalizer=canonicalizer, recheck_policy=recheck_policy,
+            rekey=rekey
+        )
         self.wayback_requester: WaybackRequester = WaybackRequester(sleep_time_seconds=sleep_time_seconds)
 
         logging.info(f'Waybacker initialized at "{self.directory}".')
 
-    def lookup(self, url: str):
+    def lookup(
+            self,
+            url: str,
+            timestamp: Optional[Union[str, datetime]] = None,
+            tolerance: Optional[timedelta] = None
+    ) -> Optional[WaybackEntry]:
+        """
+        Look up a stored entry without contacting Wayback.
+
+        :param url: The url to look up.
+        :param timestamp: If provided, the stored snapshot closest to this time is returned, if it lies within the
+            tolerance. Otherwise, the failed entry for this time is returned (e.g. if Wayback has no snapshot within
+            the tolerance).
+        :param tolerance: Maximum distance between the timestamp and a stored snapshot (default: the tolerance of the
+            Waybacker).
+        """
         url = normalize_url(url)
-        wayback_entry: Optional[WaybackEntry] = self.wayback_db.get(url)
+        if timestamp is None:
+            wayback_entry: Optional[WaybackEntry] = self.wayback_db.get(url)
+        else:
+            wayback_entry: Optional[WaybackEntry] = self._lookup_at(url, to_wayback_timestamp(timestamp), tolerance)
         return wayback_entry
 
+    def out_of_tolerance(
+            self, snapshot: Optional[Dict], timestamp: str, tolerance: Optional[timedelta] = None
+    ) -> Optional[Dict]:
+        """
+        Check the snapshot that Wayback returned for a timestamp against the tolerance.
+
+        :param snapshot: The closest snapshot in Wayback (or None).
+        :param timestamp: The requested (14-digit) Wayback timestamp.
+        :param tolerance: Maximum distance between the timestamp and the snapshot (default: the tolerance of the
+            Waybacker).
+        :return: None if the snapshot lies within the tolerance, otherwise a failed result that is keyed by the
+            requested timestamp (not by the snapshot).
+        """
+        if snapshot is None or self._is_within_tolerance(snapshot['timestamp'], timestamp, tolerance):
+            return None
+        return {
+            'success': False,
+            'error': f'Closest snapshot {snapshot["timestamp"]} lies outside the tolerance of {timestamp}',
+            'error_type': 'out-of-tolerance',
+            'wayback_data': {'status': snapshot['status'], 'available': False, 'url': None, 'timestamp': timestamp}
+        }
+
     def get(
             self,
             url: str,
             retry_unsuccessful: bool = False,
-            overwrite_entry: bool = False
+            overwrite_entry: bool = False,
+            timestamp: Optional[Union[str, datetime]] = None,
+            tolerance: Optional[timedelta] = None,
+            retry_if_due: bool = False
     ) -> WaybackEntry:
         """
         Request a page via GET request from Wayback. By default, only new requests are forwarded to wayback. If the
@@ -66,16 +127,29 @@ class Waybacker:
         :param retry_unsuccessful: If set to true, requested URLs are retried, if they led to errors in Wayback
             previously.
         :param overwrite_entry:
-            The entry for the URL is requested rom Wayback and overwrites the previous entry. DANGER: This may affect
-            the reproducibility if the new version differs from the previous version.
+            The entry for the URL is requested rom Wayback and overwrites the previous entry of the same snapshot.
+            DANGER: This may affect the reproducibility if the new version differs from the previous version.
+        :param timestamp: If provided (datetime or Wayback timestamp such as "20200315"), the snapshot closest to this
+            time is retrieved. Wayback is only contacted if no stored snapshot lies within the tolerance.
+        :param tolerance: Maximum distance between the timestamp and a stored snapshot (default: the tolerance of the
+            Waybacker).
+        :param retry_if_due: If set to true, URLs that led to errors in Wayback previously are retried, if they are
+            due for a re-check according to the re-check policy.
         """
 
         logging.info(f'Request for webpage: "{url}".')
         url = normalize_url(url)
+        if timestamp is not None:
+            return self._get_at(
+                url, to_wayback_timestamp(timestamp), tolerance, retry_unsuccessful, overwrite_entry, retry_if_due
+            )
+
         wayback_entry: Optional[WaybackEntry] = self.wayback_db.get(url)
 
         # In these cases the page must be requested
-        if wayback_entry is None or overwrite_entry or (wayback_entry.has_error() and retry_unsuccessful):
+        if wayback_entry is None or overwrite_entry or self._must_retry(
+                wayback_entry, retry_unsuccessful, retry_if_due
+        ):
             logging.info(f'Request webpage ("{url}") from he live Wayback Machine.')
             wayback_result: Dict = self.wayback_requester.get_from_wayback(url)
             wayback_entry = self.wayback_db.add_webpage(url, wayback_result)
@@ -84,18 +158,134 @@ class Waybacker:
         assert wayback_entry is not None
         return wayback_entry
 
-    def export_csv(self, urls: List[str], dest_path: str) -> pd.DataFrame:
+    def _get_at(
+            self,
+            url: str,
+            timestamp: str,
+            tolerance: Optional[timedelta],
+            retry_unsuccessful: bool,
+            overwrite_entry: bool,
+            retry_if_due: bool
+    ) -> WaybackEntry:
+        if not overwrite_entry:
+            wayback_entry: Optional[WaybackEntry] = self._lookup_at(url, timestamp, tolerance)
+            if wayback_entry is not None and not self._must_retry(wayback_entry, retry_unsuccessful, retry_if_due):
+                return wayback_entry
+
+        logging.info(f'Request webpage ("{url}") at {timestamp} from he live Wayback Machine.')
+        snapshot: Optional[Dict] = self.wayback_requester.get_snapshot(url, timestamp)
+
+        # Snapshots of other times are not an answer for this timestamp, the failure is stored for the timestamp.
+        out_of_tolerance: Optional[Dict] = self.out_of_tolerance(snapshot, timestamp, tolerance)
+        if out_of_tolerance is not None:
+            logging.info(f'No snapshot of {url} within the tolerance of {timestamp}.')
+            return self.wayback_db.add_webpage(url, out_of_tolerance)
+
+        # The closest snapshot in Wayback may be stored already (or failed, e.g. due to its mime-type).
+        if snapshot is not None and not overwrite_entry:
+            wayback_entry = self.wayback_db.get(url, snapshot['timestamp'])
+            if wayback_entry is not None and not self._must_retry(wayback_entry, retry_unsuccessful, retry_if_due):
+                return wayback_entry
+
+        wayback_result: Dict = self.wayback_requester.get_from_snapshot(url, snapshot)
+        wayback_entry = self.wayback_db.add_webpage(url, wayback_result)
+        logging.info(f'Status for webpage {url} at {timestamp}: {wayback_entry.success}')
+        return wayback_entry
+
+    @staticmethod
+    def _must_retry(wayback_entry: WaybackEntry, retry_unsuccessful: bool, retry_if_due: bool) -> bool:
+        return wayback_entry.has_error() and (retry_unsuccessful or (retry_if_due and wayback_entry.is_retry_due()))
+
+    def _lookup_at(self, url: str, timestamp: str, tolerance: Optional[timedelta]) -> Optional[WaybackEntry]:
+        wayback_entry: Optional[WaybackEntry] = self._lookup_nearest(url, timestamp, tolerance)
+        if wayback_entry is not None:
+            return wayback_entry
+
+        # Wayback had no snapshot within the tolerance of this timestamp.
+        wayback_entry = self.wayback_db.get(url, timestamp)
+        if wayback_entry is not None and wayback_entry.has_error():
+            return wayback_entry
+
+        # Only a failed entry without any snapshot is stored for this URL.
+        wayback_entry = self.wayback_db.get(url)
+        if wayback_entry is not None and wayback_entry.has_error() and wayback_entry.wayback_data['timestamp'] is None:
+            return wayback_entry
+        return None
+
+    def _lookup_nearest(self, url: str, timestamp: str, tolerance: Optional[timedelta]) -> Optional[WaybackEntry]:
+        wayback_entry: Optional[WaybackEntry] = self.wayback_db.get_nearest(url, timestamp)
+        if wayback_entry is None:
+            return None
+        return wayback_entry if self._is_within_tolerance(
+            wayback_entry.wayback_data['timestamp'], timestamp, tolerance
+        ) else None
+
+    def _is_within_tolerance(self, snapshot_timestamp: str, timestamp: str, tolerance: Optional[timedelta]) -> bool:
+        tolerance = tolerance if tolerance is not None else self.timestamp_tolerance
+        distance: timedelta = abs(parse_wayback_timestamp(snapshot_timestamp) - parse_wayback_timestamp(timestamp))
+        return distance <= tolerance
+
+    def export_csv(self, urls: List[str], dest_path: str) -> 'pd.DataFrame':
+        import pandas as pd
+
         entries: Iterable[WaybackEntry] = map(self.get, urls)
         df: pd.DataFrame = pd.DataFrame.from_records(map(lambda entry: entry.to_record(), entries))
         df.to_csv(dest_path, index=False)
         return df
 
+    def retry_due(self, limit: Optional[int] = None, batch_size: int = 1000) -> Iterator[WaybackEntry]:
+        """
+        Retry all failed entries that are due for a re-check according to the re-check policy and yield the updated
+        entries. Entries that fail again are re-checked after a longer interval.
+
+        :param limit: Maximum number of entries to retry.
+        :param batch_size: Number of due entries that are queried from the database at once.
+        """
+        # Retried entries are due after "now" at the earliest, so each query only returns entries not retried yet.
+        now: datetime = datetime.now()
+        remaining: Optional[int] = limit
+        while remaining is None or remaining > 0:
+            due: List[WaybackEntry] = self.wayback_db.retry_due(
+                now, batch_size if remaining is None else min(batch_size, remaining)
+            )
+            if len(due) == 0:
+                return
+            for wayback_entry in due:
+                yield self._retry(wayback_entry)
+            if remaining is not None:
+                remaining -= len(due)
+
+    def _retry(self, wayback_entry: WaybackEntry) -> WaybackEntry:
+        logging.info(f'Re-check failed webpage ("{wayback_entry.url}") in the live Wayback Machine.')
+        if wayback_entry.error_type == 'out-of-tolerance':
+            # A snapshot within the tolerance of the requested time may have been archived since.
+            retried_entry: WaybackEntry = self._get_at(
+                wayback_entry.url, wayback_entry.wayback_data['timestamp'], None,
+                retry_unsuccessful=True, overwrite_entry=False, retry_if_due=False
+            )
+        else:
+            wayback_result: Dict = self.wayback_requester.get_from_wayback(wayback_entry.url)
+            retried_entry: WaybackEntry = self.wayback_db.add_webpage(wayback_entry.url, wayback_result)
+
+        # A different snapshot (or none at all) does not replace the due entry, so the check is recorded separately.
+        # Otherwise the entry would stay due and be retried again.
+        if retried_entry.wayback_data['timestamp'] != wayback_entry.wayback_data['timestamp']:
+            self.wayback_db.record_check(wayback_entry)
+        logging.info(f'Status for webpage {wayback_entry.url}: {retried_entry.success}')
+        return retried_entry
+
     def get_db(self) -> WaybackDB:
         return self.wayback_db
 
     def absorb_wayback_db(self, db: WaybackDB):
-        for entry in tqdm(list(db.entries())):
-            if self.wayback_db.get(entry.url) is None:
+        """
+        Copy all entries (and downloaded pages) of another database that are not stored yet. Opening a database
+        migrates it in place; use get_wayback_db_copy() to open the other database if it must remain unchanged.
+        """
+        from tqdm import tqdm
+
+        for entry in tqdm(db.entries()):
+            if self.wayback_db.get(entry.url, entry.wayback_data['timestamp']) is None:
                 self.wayback_db.copy_wayback_entry(entry, db.download_directory)
 
     def _validate(self):
@@ -107,3 +297,6 @@ class Waybacker:
 
         if self.sleep_time_seconds < 0:
             raise ValueError(f'Values for "sleep_time_seconds" cannot be negative!')
+
+        if self.timestamp_tolerance < timedelta(0):
+            raise ValueError(f'Values for "timestamp_tolerance" cannot be negative!')